@@ -0,0 +1,62 @@
+"""
+Benchmark: thread vs process scan backends on a synthetic tree.
+
+Builds a synthetic tree with benchmarks/treegen.py in a temporary directory and
+times finder.scan() with the thread backend and with the process backend at
+1, 2, 4, ... up to all cores. benchmarks/run.py covers the other engines.
+
+Usage:
+    python benchmarks/bench_process_backend.py [--shape wide] [--scale 1.0] [--keep PATH]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils import finder  # noqa: E402
+import treegen  # noqa: E402
+
+
+def timed(**kwargs):
+    t0 = time.perf_counter()
+    result = finder.scan(**kwargs)
+    return time.perf_counter() - t0, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare finder.scan thread and process backends.")
+    parser.add_argument("--shape", choices=treegen.SHAPES, default="wide", help="Tree shape (default: wide)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Tree size multiplier (default: 1.0)")
+    parser.add_argument("--keep", metavar="PATH", help="Build (or reuse) the tree at PATH and keep it")
+    args = parser.parse_args()
+
+    root = args.keep or tempfile.mkdtemp(prefix="sizefinder-bench-")
+    try:
+        manifest = treegen.build(args.shape, root, args.scale)
+        print(f"{manifest['files']} files in {manifest['dirs']} directories under {root}")
+
+        # Warm the dentry/inode cache so every run measures the same thing
+        finder.scan(root, num_files=10)
+
+        baseline, expected = timed(root_dir=root, num_files=10)
+        print(f"threads (default): {baseline:.2f}s")
+
+        cpus = os.cpu_count() or 1
+        counts = sorted({1 << i for i in range(cpus.bit_length()) if 1 << i <= cpus} | {cpus})
+        for n in counts:
+            elapsed, result = timed(root_dir=root, num_files=10, backend="processes", max_workers=n)
+            assert result.total_size == expected.total_size, "process backend disagrees with thread backend"
+            print(f"processes={n:<3} {elapsed:.2f}s  speedup vs threads {baseline / elapsed:.2f}x")
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Benchmark harness for utils/finder.py.
+
+Builds (or reuses) synthetic trees from benchmarks/treegen.py and times each
+finder engine on each tree. Every measurement runs in a fresh child process so
+peak RSS is per case. When strace is available, a second child per case runs
+under `strace -f -c` to count syscalls; interpreter start-up syscalls (measured
+with a no-op case) are subtracted before dividing by the file count.
+
+Results are written as JSON, one object per (shape, engine) pair, so runs can be
+compared with any JSON tooling.
+
+Usage:
+    python benchmarks/run.py [--shapes wide,skewed] [--engines scan,find_largest_files]
+                             [--scale 1.0] [--repeat 3] [--trees DIR] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is reported as null
+    resource = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import treegen  # noqa: E402
+
+
+def _consume(iterable):
+    for _ in iterable:
+        pass
+
+
+def _engines():
+    """Engine name -> callable(root). Imported lazily so the no-op case measures a bare interpreter."""
+    from utils import finder
+
+    def indexed_warm(root):
+        # The cold run populating the index is part of set-up, not of the timing
+        db = os.path.join(tempfile.gettempdir(), f"sizefinder-bench-{os.getpid()}.sqlite")
+        try:
+            finder.scan(root, index_path=db)
+            t0 = time.perf_counter()
+            result = finder.scan(root, index_path=db)
+            elapsed = time.perf_counter() - t0
+            # Otherwise this would silently time a cold indexed rescan
+            assert result.reused_dirs > 0, "warm index run reused no directories"
+            return elapsed
+        finally:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(db + suffix)
+                except OSError:
+                    pass
+
+    return {
+        "get_directory_size": lambda root: finder.get_directory_size(root),
+        "find_largest_directories": lambda root: finder.find_largest_directories(root),
+        "find_largest_files": lambda root: finder.find_largest_files(root, 10),
+        "scan": lambda root: finder.scan(root),
+        "scan_processes": lambda root: finder.scan(root, backend="processes"),
+        "scan_disk_usage": lambda root: finder.scan(root, disk_usage=True),
+        "scan_index_warm": indexed_warm,
+        "iter_scan": lambda root: _consume(finder.iter_scan(root)),
+    }
+
+
+ENGINES = ("get_directory_size", "find_largest_directories", "find_largest_files", "scan",
+           "scan_processes", "scan_disk_usage", "scan_index_warm", "iter_scan")
+
+
+def _peak_rss_kb():
+    """Peak RSS of this process or any finished child (process backend), in KiB."""
+    if resource is None:
+        return None
+    scale = 1024 if sys.platform == "darwin" else 1  # macOS reports bytes
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale
+    return max(own, kids)
+
+
+def child(engine, root):
+    """Run one engine once in this (fresh) process and print a JSON measurement."""
+    if engine == "noop":
+        print(json.dumps({"elapsed_s": 0.0, "peak_rss_kb": _peak_rss_kb()}))
+        return
+    fn = _engines()[engine]
+    t0 = time.perf_counter()
+    ret = fn(root)
+    elapsed = time.perf_counter() - t0
+    if isinstance(ret, float):
+        # engines with untimed set-up return their own timing
+        elapsed = ret
+    print(json.dumps({"elapsed_s": elapsed, "peak_rss_kb": _peak_rss_kb()}))
+
+
+def _run_child(engine, root, strace_out=None):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", engine, root]
+    if strace_out is not None:
+        cmd = ["strace", "-f", "-c", "-o", strace_out] + cmd
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def _count_syscalls(engine, root):
+    """Total syscalls made by one child run of engine, or None without strace."""
+    if shutil.which("strace") is None:
+        return None
+    fd, path = tempfile.mkstemp(prefix="sizefinder-strace-")
+    os.close(fd)
+    try:
+        _run_child(engine, root, strace_out=path)
+        with open(path) as fh:
+            for line in fh:
+                parts = line.split()
+                if parts and parts[-1] == "total":
+                    return int(parts[3])
+    except (subprocess.CalledProcessError, ValueError, IndexError):
+        return None
+    finally:
+        os.remove(path)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the finder engines on synthetic trees.")
+    parser.add_argument("--shapes", default=",".join(treegen.SHAPES),
+                        help=f"Comma-separated tree shapes (default: {','.join(treegen.SHAPES)})")
+    parser.add_argument("--engines", default=",".join(ENGINES),
+                        help=f"Comma-separated engines (default: {','.join(ENGINES)})")
+    parser.add_argument("--scale", type=float, default=1.0, help="Tree size multiplier (default: 1.0)")
+    parser.add_argument("--seed", type=int, default=0, help="Tree generator seed (default: 0)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case; the best is kept (default: 3)")
+    parser.add_argument("--trees", metavar="DIR",
+                        help="Directory to build/reuse trees in (default: a temporary directory, removed afterwards)")
+    parser.add_argument("--no-syscalls", action="store_true", help="Skip the strace syscall count pass")
+    parser.add_argument("--output", metavar="FILE", help="Write JSON results here instead of stdout")
+    parser.add_argument("--child", nargs=2, metavar=("ENGINE", "ROOT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    shapes = [s for s in args.shapes.split(",") if s]
+    engines = [e for e in args.engines.split(",") if e]
+    for e in engines:
+        if e not in ENGINES:
+            parser.error(f"unknown engine {e!r}")
+
+    trees_dir = args.trees or tempfile.mkdtemp(prefix="sizefinder-trees-")
+    count_syscalls = not args.no_syscalls and shutil.which("strace") is not None
+    baseline_syscalls = _count_syscalls("noop", trees_dir) if count_syscalls else None
+
+    results = []
+    try:
+        for shape in shapes:
+            root = os.path.join(trees_dir, f"{shape}-x{args.scale:g}-s{args.seed}")
+            print(f"[{shape}] building/reusing tree at {root}...", file=sys.stderr)
+            manifest = treegen.build(shape, root, args.scale, args.seed)
+            _run_child("scan", root)  # warm the dentry/inode cache for every engine alike
+
+            for engine in engines:
+                runs = [_run_child(engine, root) for _ in range(max(1, args.repeat))]
+                best = min(r["elapsed_s"] for r in runs)
+                row = {
+                    "shape": shape,
+                    "engine": engine,
+                    "files": manifest["files"],
+                    "dirs": manifest["dirs"],
+                    "elapsed_s": round(best, 6),
+                    "files_per_sec": round(manifest["files"] / best) if best > 0 else None,
+                    "peak_rss_kb": max((r["peak_rss_kb"] for r in runs if r["peak_rss_kb"] is not None), default=None),
+                    "syscalls_per_file": None,
+                }
+                if count_syscalls:
+                    calls = _count_syscalls(engine, root)
+                    if calls is not None and manifest["files"]:
+                        row["syscalls_per_file"] = round((calls - (baseline_syscalls or 0)) / manifest["files"], 3)
+                results.append(row)
+                print(f"[{shape}] {engine}: {best:.3f}s, {row['files_per_sec']} files/s, "
+                      f"{row['peak_rss_kb']} KiB peak, {row['syscalls_per_file']} syscalls/file", file=sys.stderr)
+    finally:
+        if not args.trees:
+            shutil.rmtree(trees_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "scale": args.scale,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Reproducible synthetic directory trees for the finder benchmarks.
+
+Every shape is generated from a seed, so two runs with the same shape/scale/seed
+produce the same tree. File contents are never written: sizes are set with
+truncate(), which keeps even large trees cheap to build (and makes every file
+sparse on filesystems that support it).
+
+Shapes:
+    wide    - one level of many directories, a few dozen files each
+    deep    - long directory chains with a few files at every level
+    skewed  - eight top-level folders, one of which holds ~95% of the files
+    tiny    - very many zero/few-byte files (scale 10 => ~1M files)
+    sparse  - a handful of huge sparse files (VM image / database style)
+
+Usage:
+    python benchmarks/treegen.py SHAPE PATH [--scale 1.0] [--seed 0]
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+SHAPES = ("wide", "deep", "skewed", "tiny", "sparse")
+
+MANIFEST = ".treegen.json"
+
+# Directory mtimes are set this far back after building: the scan index treats directories
+# changed in the last few seconds as dirty, so a fresh tree would never be reused
+BACKDATE_S = 3600
+
+
+def _touch(path, size):
+    with open(path, "wb") as fh:
+        if size:
+            fh.truncate(size)
+
+
+def _wide(root, scale, rng, stats):
+    for d in range(int(2000 * scale) or 1):
+        path = os.path.join(root, f"dir{d:05d}")
+        os.mkdir(path)
+        for f in range(25):
+            size = rng.randint(0, 1 << 20)
+            _touch(os.path.join(path, f"file{f:03d}.dat"), size)
+            stats["files"] += 1
+            stats["bytes"] += size
+
+
+def _deep(root, scale, rng, stats):
+    for chain in range(int(50 * scale) or 1):
+        path = os.path.join(root, f"chain{chain:03d}")
+        for level in range(40):
+            path = os.path.join(path, f"level{level:02d}")
+            os.makedirs(path)
+            for f in range(5):
+                size = rng.randint(0, 1 << 18)
+                _touch(os.path.join(path, f"f{f}.bin"), size)
+                stats["files"] += 1
+                stats["bytes"] += size
+
+
+def _skewed(root, scale, rng, stats):
+    total_leaves = int(1000 * scale) or 1
+    for top in range(8):
+        # folder 0 gets ~95% of the leaves, the other seven share the rest
+        leaves = int(total_leaves * 0.95) if top == 0 else max(1, int(total_leaves * 0.05 / 7))
+        for leaf in range(leaves):
+            path = os.path.join(root, f"top{top}", f"mid{leaf % 20:02d}", f"leaf{leaf:05d}")
+            os.makedirs(path, exist_ok=True)
+            for f in range(20):
+                size = rng.randint(0, 1 << 20)
+                _touch(os.path.join(path, f"f{f:02d}.dat"), size)
+                stats["files"] += 1
+                stats["bytes"] += size
+
+
+def _tiny(root, scale, rng, stats):
+    for d in range(int(100 * scale) or 1):
+        path = os.path.join(root, f"bucket{d:04d}")
+        os.mkdir(path)
+        for f in range(1000):
+            size = rng.randint(0, 64)
+            _touch(os.path.join(path, f"t{f:04d}"), size)
+            stats["files"] += 1
+            stats["bytes"] += size
+
+
+def _sparse(root, scale, rng, stats):
+    for d in range(4):
+        path = os.path.join(root, f"images{d}")
+        os.mkdir(path)
+        for f in range(int(8 * scale) or 1):
+            size = rng.randint(1 << 30, 8 << 30)
+            _touch(os.path.join(path, f"disk{f:02d}.img"), size)
+            stats["files"] += 1
+            stats["bytes"] += size
+
+
+_BUILDERS = {"wide": _wide, "deep": _deep, "skewed": _skewed, "tiny": _tiny, "sparse": _sparse}
+
+
+def build(shape, root, scale=1.0, seed=0):
+    """
+    Create (or reuse) a synthetic tree at root.
+
+    If root already holds a tree built with the same shape/scale/seed it is reused as-is.
+    Directory mtimes are moved BACKDATE_S seconds into the past, as for a settled tree.
+
+    Returns:
+        dict: Manifest with shape, scale, seed, files, dirs and bytes.
+    """
+    if shape not in _BUILDERS:
+        raise ValueError(f"Unknown shape {shape!r}; expected one of {', '.join(SHAPES)}")
+    manifest_path = os.path.join(root, MANIFEST)
+    params = {"shape": shape, "scale": scale, "seed": seed}
+    try:
+        with open(manifest_path) as fh:
+            manifest = json.load(fh)
+        if all(manifest.get(k) == v for k, v in params.items()):
+            return manifest
+        raise SystemExit(f"{root} holds a different synthetic tree; pick an empty path")
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(root, exist_ok=True)
+    if os.listdir(root):
+        raise SystemExit(f"{root} is not empty; pick an empty path")
+    stats = {"files": 0, "dirs": 0, "bytes": 0}
+    _BUILDERS[shape](root, scale, random.Random(seed), stats)
+    stats["dirs"] = sum(len(dirnames) for _, dirnames, _ in os.walk(root))
+    manifest = dict(params, **stats)
+    with open(manifest_path, "w") as fh:
+        json.dump(manifest, fh)
+    then = time.time() - BACKDATE_S
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, (then, then))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a reproducible synthetic directory tree.")
+    parser.add_argument("shape", choices=SHAPES)
+    parser.add_argument("path", help="Empty (or previously generated) directory to build the tree in")
+    parser.add_argument("--scale", type=float, default=1.0, help="Size multiplier (default: 1.0)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+    print(json.dumps(build(args.shape, args.path, args.scale, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
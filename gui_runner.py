@@ -1,14 +1,28 @@
 import threading
 import time
 import os
+import sqlite3
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import customtkinter as ctk
 import utils.finder as finder # imports find_largest_directories, find_largest_files, format_size
+from utils.filters import ScanFilter
+from utils.checkpoint import DEFAULT_CHECKPOINT_PATH
+from utils.index import DEFAULT_INDEX_PATH
+from utils.watch import watch
 from utils.spinner import Spinner
+from utils.updates import UpdateChannel
+from utils.resultsview import ResultsTable, DARK_PALETTE, KIND_FILE
 
 # Global spinner instance
 spinner = None
+# Global batched update channel (worker threads -> Tk main loop)
+updates = None
+# Size tree of the last finished scan, for drilling down without rescanning
+last_tree = None
+# File rows and folder on-disk sizes of the last scan; watch updates only carry folder totals
+last_files = []
+last_dir_usage = None
 # Global cancellation event (set when user requests stop)
 scan_cancel_event = None
 
@@ -30,6 +44,7 @@ def run_scan_background():
             text_output.delete("0.0", tk.END)
         except Exception:
             pass
+    show_results([], [])
 
     try:
         path = path_var.get().strip()
@@ -47,7 +62,27 @@ def run_scan_background():
         except Exception:
             files_num = 10
 
-        thread = threading.Thread(target=worker, args=(path, max(0, folders_num), max(0, files_num)))
+        disk_usage = bool(disk_usage_var.get())
+        filters = read_filters()
+        # Checkpoints do not cover allocated-block accounting; they take precedence over the scan index
+        checkpoint_path = DEFAULT_CHECKPOINT_PATH if resumable_var.get() and not disk_usage else None
+        # The scan index holds neither allocated blocks nor filtered listings, so such scans always read the tree
+        index_path = None
+        if use_index_var.get() and not disk_usage and filters is None and checkpoint_path is None:
+            index_path = DEFAULT_INDEX_PATH
+
+        stats = finder.ScanStats() if show_stats_var.get() else None
+        set_stats_text("")
+        file_types = bool(file_types_var.get())
+        budget_text = time_limit_entry.get().strip()
+        try:
+            time_budget = float(budget_text) if budget_text else None
+        except ValueError:
+            raise ValueError("Time limit must be a number of seconds.")
+
+        thread = threading.Thread(target=worker, args=(path, max(0, folders_num), max(0, files_num), index_path, disk_usage,
+                                                       stats, file_types, filters, checkpoint_path, time_budget,
+                                                       bool(watch_var.get())))
         thread.daemon = True
         thread.start()
     except Exception as e:
@@ -55,8 +90,26 @@ def run_scan_background():
         set_ui_enabled(True)
         spinner.stop()
 
+def read_filters():
+    """Build a ScanFilter from the filter fields (None when they are all empty)."""
+    exclude = [g.strip() for g in exclude_var.get().split(",") if g.strip()]
+    include = [g.strip() for g in include_var.get().split(",") if g.strip()]
+    depth_text = max_depth_var.get().strip()
+    size_text = min_size_var.get().strip()
+    try:
+        max_depth = int(depth_text) if depth_text else None
+        min_size = int(size_text) if size_text else 0
+    except ValueError:
+        raise ValueError("Max depth and min size must be whole numbers.")
+    one_filesystem = bool(one_fs_var.get())
+    if not (exclude or include or max_depth is not None or min_size > 0 or one_filesystem):
+        return None
+    return ScanFilter(include=include, exclude=exclude, max_depth=max_depth, min_size=min_size,
+                      one_filesystem=one_filesystem)
+
+
 def append_text(text: str):
-    """Insert text into the GUI text widget (must be called from main thread via root.after)."""
+    """Insert text into the GUI text widget (main thread only; worker threads go through `updates`)."""
     try:
         text_output.insert(tk.END, text)
         text_output.see(tk.END)
@@ -85,7 +138,7 @@ def stop_scan():
     global scan_cancel_event
     if scan_cancel_event is not None:
         scan_cancel_event.set()
-        root.after(0, append_text, "\nCancellation requested — stopping soon...\n")
+        updates.put_text("\nCancellation requested — stopping soon...\n")
     try:
         btn_stop.configure(state="disabled")
         btn_browse.configure(state="normal")
@@ -94,85 +147,202 @@ def stop_scan():
         pass
 
 
-def worker(path, folders_num, files_num):
+def worker(path, folders_num, files_num, index_path=None, disk_usage=False, stats=None, file_types=False, filters=None,
+           checkpoint_path=None, time_budget=None, watch_changes=False):
     global scan_cancel_event, spinner
     start_total = time.perf_counter()
 
-    # Folders
-    entries = []
-    try:
-        entries = os.listdir(path)
-    except OSError as e:
-        root.after(0, append_text, f"Error accessing path: {e}\n")
-        root.after(0, set_ui_enabled, True)
-        root.after(0, spinner.stop)
+    if not os.access(path, os.R_OK | os.X_OK):
+        updates.put_text(f"Error accessing path: '{path}' is not readable.\n")
+        updates.call(set_ui_enabled, True)
+        updates.call(spinner.stop)
         return
 
-    immediate_subdirs = [os.path.join(path, item) for item in entries
-                         if os.path.isdir(os.path.join(path, item)) and not os.path.islink(os.path.join(path, item))]
-    available_subdirs_count = len(immediate_subdirs)
-    folders_to_request = min(folders_num, available_subdirs_count)
-
     # Check cancellation before starting heavy work
     if scan_cancel_event is not None and scan_cancel_event.is_set():
-        root.after(0, append_text, "Scan cancelled before starting folder scan.\n")
-        root.after(0, set_ui_enabled, True)
-        root.after(0, spinner.stop)
+        updates.put_text("Scan cancelled before starting.\n")
+        updates.call(set_ui_enabled, True)
+        updates.call(spinner.stop)
         return
 
-    if available_subdirs_count == 0 or folders_to_request == 0:
-        root.after(0, append_text, "No immediate subdirectories found or requested 0.\n")
-        largest_dirs = []
+    # Single pass: folder totals and largest files come from the same walk
+    updates.put_text(f"Working: scanning '{path}' (returning top {folders_num} folders and top {files_num} files)...\n")
+    t0 = time.perf_counter()
+    # Wall-clock start, so watch mode can reuse this scan's tree and re-list only what changed since
+    started_ns = time.time_ns()
+    result = None
+    # A resumable scan continues from the saved checkpoint when there is one for this folder
+    resume = checkpoint_path is not None
+    while result is None:
+        try:
+            # Stream events so finished folders and running totals show up while the scan runs
+            for event in finder.iter_scan(path, num_dirs=folders_num, num_files=files_num, cancel_event=scan_cancel_event,
+                                          index_path=index_path, disk_usage=disk_usage, progress_interval=1.0,
+                                          stats=stats, file_types=file_types, filters=filters,
+                                          checkpoint_path=checkpoint_path, resume=resume, time_budget=time_budget):
+                if event.kind == finder.ScanEvent.DIR_DONE:
+                    updates.put_text(f"  finished {event.path}: {finder.format_size(event.size)}\n")
+                elif event.kind == finder.ScanEvent.PROGRESS:
+                    updates.put_text(f"  ... {event.dirs_seen} folders, {finder.format_size(event.total_size)} so far\n")
+                    if stats is not None:
+                        updates.call(set_stats_text, stats.format(brief=True))
+                elif event.kind == finder.ScanEvent.DONE:
+                    result = event.result
+        except ValueError as e:
+            if not resume:
+                raise
+            # The checkpoint belongs to another folder; it is overwritten by this scan
+            updates.put_text(f"{e}; starting a fresh scan.\n")
+            resume = False
+        except sqlite3.Error as e:
+            if index_path is None:
+                raise
+            # E.g. an unwritable home folder or a locked/corrupt index: the scan works without it
+            updates.put_text(f"Scan index unavailable ({e}); scanning without it.\n")
+            index_path = None
+    t1 = time.perf_counter()
+    if not result.approximate:
+        updates.put_text(f"Finished scanning {result.subdir_count} subdirectories in {t1 - t0:.2f}s.\n")
+    elif scan_cancel_event is not None and scan_cancel_event.is_set():
+        updates.put_text(f"Scan cancelled after {t1 - t0:.2f}s; partial results follow (approximate, sizes are lower bounds).\n")
     else:
-        root.after(0, append_text, f"Working: scanning {available_subdirs_count} subdirectories (returning top {folders_to_request})...\n")
-        t0 = time.perf_counter()
-        largest_dirs = finder.find_largest_directories(path, num_largest=folders_to_request, cancel_event=scan_cancel_event)
-        t1 = time.perf_counter()
-        root.after(0, append_text, f"Finished scanning folders in {t1 - t0:.2f}s.\n")
-        # Check cancellation after folder scan
-        if scan_cancel_event is not None and scan_cancel_event.is_set():
-            root.after(0, append_text, "Scan cancelled after folder scan.\n")
-            root.after(0, set_ui_enabled, True)
-            root.after(0, spinner.stop)
-            return
-
-    if largest_dirs:
-        root.after(0, append_text, f"\nTop {len(largest_dirs)} largest subdirectories in '{path}':\n")
-        for dir_path, size in largest_dirs:
-            root.after(0, append_text, f"- {dir_path}: {finder.format_size(size)}\n")
+        updates.put_text(f"Time limit reached after {t1 - t0:.2f}s; partial results follow (approximate, sizes are lower bounds).\n")
+    if result.approximate and checkpoint_path is not None:
+        updates.put_text("Progress was saved; start the scan again with 'Resumable' ticked to continue.\n")
+    if index_path is not None:
+        updates.put_text(f"Reused {result.reused_dirs} unchanged directories from the scan index.\n")
+
+    # Folders and files go to the results table in one call, however many were requested
+    updates.call(show_results, result.dirs, result.files, result.dir_usage)
+    if result.subdir_count == 0 or folders_num == 0:
+        updates.put_text("No immediate subdirectories found or requested 0.\n")
+    elif result.dirs:
+        updates.put_text(f"\nTop {len(result.dirs)} largest subdirectories in '{path}' are listed in the table.\n")
     else:
-        root.after(0, append_text, "\nNo subdirectories found or an error occurred.\n")
-
-    # Files
+        updates.put_text("\nNo subdirectories found or an error occurred.\n")
     if files_num == 0:
-        root.after(0, append_text, "\nSkipping file scan (requested 0).\n")
-        largest_files = []
-    else:
-        root.after(0, append_text, f"\nWorking: scanning files recursively (returning top {files_num})...\n")
-        t0 = time.perf_counter()
-        largest_files = finder.find_largest_files(path, num_files=files_num, cancel_event=scan_cancel_event)
-        t1 = time.perf_counter()
-        root.after(0, append_text, f"Finished scanning files in {t1 - t0:.2f}s.\n")
-
-    if largest_files:
-        root.after(0, append_text, f"\nTop {len(largest_files)} largest files in '{path}':\n")
-        for file_path, size in largest_files:
-            root.after(0, append_text, f"- {file_path}: {finder.format_size(size)}\n")
+        updates.put_text("Skipping file listing (requested 0).\n")
+    elif result.files:
+        updates.put_text(f"Top {len(result.files)} largest files in '{path}' are listed in the table.\n")
     else:
-        root.after(0, append_text, "\nNo files found or an error occurred.\n")
+        updates.put_text("No files found or an error occurred.\n")
+
+    if result.total_usage is not None:
+        updates.put_text(f"\nTotal: {finder.format_size(result.total_size)} apparent, {finder.format_size(result.total_usage)} on disk\n")
+
+    if result.types is not None:
+        type_rows = result.types.extensions(max(folders_num, files_num) or 10)
+        updates.put_text(f"\nTop {len(type_rows)} file types by size:\n")
+        for ext, count, size in type_rows:
+            updates.put_text(f"- {ext or '(no extension)'}: {finder.format_size(size)} in {count:,} files\n")
+        updates.put_text("\nFiles by size:\n")
+        for low, high, count, size in result.types.size_buckets():
+            span = "empty" if high == 1 else f"{finder.format_size(low)} - {finder.format_size(high)}"
+            updates.put_text(f"- {span}: {count:,} files, {finder.format_size(size)}\n")
+
+    if stats is not None:
+        updates.call(set_stats_text, stats.format(brief=True))
+        updates.put_text("\n" + stats.format() + "\n")
 
     # final elapsed
     end_total = time.perf_counter()
-    root.after(0, append_text, f"\nTotal elapsed time: {end_total - start_total:.2f}s\n")
+    updates.put_text(f"\nTotal elapsed time: {end_total - start_total:.2f}s\n")
+    updates.call(set_last_tree, result.tree)
+    if watch_changes and not result.approximate:
+        # Keep the ranking current from change notifications until Stop is pressed
+        updates.put_text("\nWatching for changes (press Stop to end)...\n")
+        # A resumed scan holds work from before started_ns, so only a fresh tree can seed the watcher
+        tree = result.tree if checkpoint_path is None else None
+        watch(path, folders_num, cancel_event=scan_cancel_event, filters=filters, tree=tree,
+              started_ns=started_ns if tree is not None else None,
+              on_update=lambda current: updates.call(show_watch_ranking, current))
+        updates.put_text("Stopped watching.\n")
     # Re-enable UI
-    root.after(0, set_ui_enabled, True)
-    root.after(0, spinner.stop)
+    updates.call(set_ui_enabled, True)
+    updates.call(spinner.stop)
+
+def show_watch_ranking(result):
+    """Show the latest watch-mode ranking in the results table (main thread only)."""
+    append_text(f"Watching '{result.root_dir}' — updated {time.strftime('%H:%M:%S')}, "
+                f"total {finder.format_size(result.total_size)}\n")
+    # Keep the scan's file rows and on-disk sizes; only the folder totals are refreshed
+    show_results(result.dirs, last_files, last_dir_usage)
+
+
+def show_results(dirs, files, dir_usage=None):
+    """Load (path, size) rows into the results table, keeping its sort order and filter (main thread only)."""
+    global last_files, last_dir_usage
+    last_files = files
+    last_dir_usage = dir_usage
+    results_table.set_rows(dirs, files, dir_usage)
+    update_results_count()
+
+
+def apply_results_filter(*_):
+    """Filter the results table by the filter field as it is typed (in memory, no rescan)."""
+    results_table.set_filter(results_filter_var.get())
+    update_results_count()
+
+
+def update_results_count():
+    model = results_table.model
+    if model.total_rows and len(model) != model.total_rows:
+        results_count_label.configure(text=f"{len(model):,} of {model.total_rows:,} rows")
+    else:
+        results_count_label.configure(text=f"{model.total_rows:,} rows")
+
+
+def activate_result(path, kind):
+    """Double-click on a result: drill into that folder (or a file's folder) of the last scan."""
+    drill_var.set(os.path.dirname(path) if kind == KIND_FILE else path)
+    if last_tree is not None:
+        drill_down()
+
+
+def set_stats_text(text):
+    """Show the live scan statistics line (main thread only)."""
+    try:
+        stats_label.configure(text=text)
+    except Exception:
+        pass
+
+
+def set_last_tree(tree):
+    """Remember the last scan's size tree and point the drill-down field at its root."""
+    global last_tree
+    last_tree = tree
+    if tree is not None:
+        drill_var.set(tree.root_dir)
+
+
+def drill_down():
+    """Handler for Show button: list the largest subfolders of the chosen folder from the last scan."""
+    if last_tree is None:
+        messagebox.showinfo("Drill down", "Run a scan first.")
+        return
+    target = drill_var.get().strip() or last_tree.root_dir
+    node = last_tree.find(target)
+    if node is None:
+        messagebox.showerror("Drill down", f"'{target}' is not part of the last scan of '{last_tree.root_dir}'.")
+        return
+    try:
+        num = max(0, int(folders_var.get())) or None
+    except Exception:
+        num = 10
+    lines = [f"\n{last_tree.path(node)}: {finder.format_size(last_tree.total[node])} "
+             f"({finder.format_size(last_tree.own[node])} in files directly here)\n"]
+    for dir_path, size in last_tree.largest_children(node, num):
+        lines.append(f"- {dir_path}: {finder.format_size(size)}\n")
+    if len(lines) == 1:
+        lines.append("(no subfolders)\n")
+    append_text("".join(lines))
+
 
 def finish(lines, start_total):
     end_total = time.perf_counter()
     lines.append(f"\nTotal elapsed time: {end_total - start_total:.2f}s")
     text = "\n".join(lines)
-    root.after(0, display_output, text)
+    updates.call(display_output, text)
 
 def display_output(text):
     text_output.insert("1.0", text)
@@ -208,6 +378,15 @@ ctk.CTkLabel(frm, text="Return files (num):").grid(row=2, column=0, sticky="w",
 files_var = tk.StringVar(value="10")
 ctk.CTkEntry(frm, width=120, textvariable=files_var).grid(row=2, column=1, sticky="w", pady=(6,0), padx=6)
 
+use_index_var = tk.BooleanVar(value=False)
+ctk.CTkCheckBox(frm, text="Use scan index (faster rescans)", variable=use_index_var).grid(row=2, column=1, sticky="e", pady=(6,0), padx=6)
+disk_usage_var = tk.BooleanVar(value=False)
+ctk.CTkCheckBox(frm, text="Disk usage (allocated blocks)", variable=disk_usage_var).grid(row=1, column=1, sticky="e", pady=(6,0), padx=6)
+file_types_var = tk.BooleanVar(value=False)
+ctk.CTkCheckBox(frm, text="File types", variable=file_types_var).grid(row=2, column=2, sticky="w", pady=(6,0), padx=6)
+show_stats_var = tk.BooleanVar(value=False)
+ctk.CTkCheckBox(frm, text="Show statistics", variable=show_stats_var).grid(row=1, column=2, sticky="w", pady=(6,0), padx=6)
+
 btn_start = ctk.CTkButton(frm, text="Start scan", command=run_scan_background)
 btn_start.grid(row=3, column=1, pady=(10,0))
 
@@ -222,13 +401,67 @@ spinner_label.grid(row=3, column=0, padx=(6, 0), pady=(10,0), sticky="w")
 
 spinner = Spinner(spinner_label, root)
 
+# Log on top, results table below; both share the row the output box used to fill
+output_frame = ctk.CTkFrame(frm, fg_color="transparent")
+output_frame.grid(row=4, column=0, columnspan=3, pady=(8,0), sticky="nsew")
+
 # CTk has CTkTextbox in recent versions; fall back to tk.Text if not available
 CTkTextbox = getattr(ctk, "CTkTextbox", None)
 if CTkTextbox is not None:
-    text_output = CTkTextbox(frm, width=880, height=400)
+    text_output = CTkTextbox(output_frame, width=880, height=140)
 else:
-    text_output = tk.Text(frm, width=100, height=25)
-text_output.grid(row=4, column=0, columnspan=3, pady=(8,0))
+    text_output = tk.Text(output_frame, width=100, height=8)
+text_output.grid(row=0, column=0, columnspan=3, sticky="ew")
+
+# Results: sortable by clicking a header, filtered in memory; only visible rows are drawn
+ctk.CTkLabel(output_frame, text="Filter results:").grid(row=1, column=0, sticky="w", padx=6, pady=(6, 0))
+results_filter_var = tk.StringVar(value="")
+results_filter_var.trace_add("write", apply_results_filter)
+ctk.CTkEntry(output_frame, width=560, textvariable=results_filter_var).grid(row=1, column=1, sticky="w", pady=(6, 0))
+results_count_label = ctk.CTkLabel(output_frame, text="0 rows", anchor="e")
+results_count_label.grid(row=1, column=2, sticky="e", padx=6, pady=(6, 0))
+results_table = ResultsTable(output_frame, width=880, height=300, on_activate=activate_result,
+                             palette=DARK_PALETTE if ctk.get_appearance_mode() == "Dark" else None)
+results_table.grid(row=2, column=0, columnspan=3, pady=(6, 0), sticky="nsew")
+output_frame.columnconfigure(1, weight=1)
+output_frame.rowconfigure(2, weight=1)
+
+# Drill-down into the last scan's size tree (no rescan)
+ctk.CTkLabel(frm, text="Drill into:").grid(row=5, column=0, sticky="w", padx=6, pady=(6, 6))
+drill_var = tk.StringVar()
+ctk.CTkEntry(frm, width=560, textvariable=drill_var).grid(row=5, column=1, pady=(6, 6))
+ctk.CTkButton(frm, text="Show", command=drill_down).grid(row=5, column=2, padx=6, pady=(6, 6))
+
+# Pruning filters, applied while walking (comma-separated globs)
+ctk.CTkLabel(frm, text="Exclude (globs):").grid(row=6, column=0, sticky="w", padx=6, pady=(0, 6))
+exclude_var = tk.StringVar(value="")
+ctk.CTkEntry(frm, width=560, textvariable=exclude_var).grid(row=6, column=1, pady=(0, 6))
+one_fs_var = tk.BooleanVar(value=False)
+ctk.CTkCheckBox(frm, text="One filesystem", variable=one_fs_var).grid(row=6, column=2, sticky="w", padx=6, pady=(0, 6))
+
+ctk.CTkLabel(frm, text="Include (globs):").grid(row=7, column=0, sticky="w", padx=6, pady=(0, 6))
+include_var = tk.StringVar(value="")
+ctk.CTkEntry(frm, width=560, textvariable=include_var).grid(row=7, column=1, pady=(0, 6))
+time_limit_entry = ctk.CTkEntry(frm, width=140, placeholder_text="Time limit (s)")
+time_limit_entry.grid(row=7, column=2, sticky="w", padx=6, pady=(0, 6))
+
+ctk.CTkLabel(frm, text="Max depth / min size (bytes):").grid(row=8, column=0, sticky="w", padx=6, pady=(0, 6))
+max_depth_var = tk.StringVar(value="")
+min_size_var = tk.StringVar(value="")
+ctk.CTkEntry(frm, width=120, textvariable=max_depth_var).grid(row=8, column=1, sticky="w", pady=(0, 6))
+ctk.CTkEntry(frm, width=120, textvariable=min_size_var).grid(row=8, column=1, sticky="e", pady=(0, 6))
+resumable_var = tk.BooleanVar(value=False)
+ctk.CTkCheckBox(frm, text="Resumable (checkpoint)", variable=resumable_var).grid(row=8, column=2, sticky="w", padx=6, pady=(0, 6))
+
+# Live scan statistics (only filled in when "Show statistics" is ticked)
+stats_label = ctk.CTkLabel(frm, text="", anchor="w")
+stats_label.grid(row=9, column=0, columnspan=2, sticky="w", padx=6, pady=(0, 6))
+watch_var = tk.BooleanVar(value=False)
+ctk.CTkCheckBox(frm, text="Watch for changes", variable=watch_var).grid(row=9, column=2, sticky="w", padx=6, pady=(0, 6))
+
+# Worker output is queued and written in batches on a fixed tick so the UI never floods
+updates = UpdateChannel(root, append_text)
+updates.start()
 
 root.columnconfigure(0, weight=1)
 root.rowconfigure(0, weight=1)
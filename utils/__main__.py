@@ -0,0 +1,5 @@
+"""``python -m utils``: the headless command-line interface."""
+
+from utils.cli import main
+
+main(prog="python -m utils")
@@ -0,0 +1,50 @@
+"""
+Scan checkpoints.
+A checkpoint holds a paused walk's frontier (directories not listed yet) and the
+partial aggregates of everything listed so far, so an interrupted scan can be
+continued instead of restarted.
+"""
+
+import os
+import pickle
+
+# Default checkpoint location used by the GUI and CLI when no path is given
+DEFAULT_CHECKPOINT_PATH = os.path.join(os.path.expanduser("~"), ".sizefinder-checkpoint")
+
+_FORMAT = "sizefinder-checkpoint-1"
+
+
+def save_checkpoint(path, state):
+    """
+    Write state (a dict of picklable values) to path, replacing any earlier checkpoint atomically.
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        pickle.dump((_FORMAT, state), fh, protocol=pickle.HIGHEST_PROTOCOL)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    """
+    Return the state saved at path, or None if there is no usable checkpoint there.
+    Checkpoints are pickles: only load files this program wrote.
+    """
+    try:
+        with open(path, "rb") as fh:
+            fmt, state = pickle.load(fh)
+    except FileNotFoundError:
+        return None
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+        return None
+    return state if fmt == _FORMAT else None
+
+
+def remove_checkpoint(path):
+    """Delete the checkpoint at path (a finished scan has nothing to resume)."""
+    for p in (path, path + ".tmp"):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,465 @@
+"""
+Command-line interface: ``python -m utils`` (or ``python main.py``).
+Only the finder core is imported up front; optional modules (filters, throttling,
+index, checkpoints, snapshots, watch mode, JSON output) are imported by the options
+that use them, so short scans are not dominated by start-up time.
+"""
+
+import argparse
+import os
+import signal
+import threading
+import time
+
+from utils.finder import scan, scan_roots, find_duplicates, estimate_largest_directories, format_size, ScanStats
+
+# Stand-in for the default --index/--checkpoint locations, resolved after parsing so
+# that sqlite3 and pickle are only imported when those options are used
+_DEFAULT_PATH = "\0default"
+
+def browse(tree, num_dirs):
+    """Interactive drill-down over a finished scan's size tree (no rescanning)."""
+    node = 0
+    while True:
+        kids = sorted(tree.children(node), key=tree.total.__getitem__, reverse=True)[:num_dirs or None]
+        print(f"\n{tree.path(node)}: {format_size(tree.total[node])} "
+              f"({format_size(tree.own[node])} in files directly here)")
+        for i, child in enumerate(kids, 1):
+            print(f"  [{i}] {tree.names[child]}: {format_size(tree.total[child])}")
+        try:
+            choice = input("Number or name to drill into, '..' to go up, blank to quit: ").strip()
+        except EOFError:
+            return
+        if not choice:
+            return
+        if choice == "..":
+            node = max(tree.parent[node], 0)
+        elif choice.isdigit() and 1 <= int(choice) <= len(kids):
+            node = kids[int(choice) - 1]
+        else:
+            found = tree.find(os.path.join(tree.path(node), choice))
+            if found is None:
+                print(f"'{choice}' is not a scanned subdirectory here.")
+            else:
+                node = found
+
+
+def print_diff(old_path, new_path, num_dirs):
+    """Print the fastest-growing directories between two saved snapshots (no filesystem access)."""
+    from utils.snapshot import load_snapshot, diff_snapshots
+
+    old = load_snapshot(old_path)
+    new = load_snapshot(new_path)
+    days = (new.created - old.created) / 86400
+    print(f"'{new.root_dir}': {format_size(old.total_size)} -> {format_size(new.total_size)} "
+          f"between {time.ctime(old.created)} and {time.ctime(new.created)}")
+    rows = [r for r in diff_snapshots(old, new, num_dirs or None) if r[2] != r[1]]
+    if not rows:
+        print("No directory changed size.")
+        return
+    print(f"\nTop {len(rows)} fastest-growing directories:")
+    for dir_path, old_size, new_size in rows:
+        delta = new_size - old_size
+        sign = "+" if delta >= 0 else "-"
+        rate = f", {sign}{format_size(abs(delta) / days)}/day" if days > 0 else ""
+        print(f"- {dir_path}: {format_size(old_size)} -> {format_size(new_size)} ({sign}{format_size(abs(delta))}{rate})")
+
+
+def print_duplicates(groups, num_groups):
+    """Print the duplicate groups that waste the most space and the total reclaimable size."""
+    wasted = sum(size * (len(paths) - 1) for size, paths in groups)
+    print(f"Found {len(groups)} groups of identical files; {format_size(wasted)} reclaimable.")
+    for size, paths in groups[:num_groups]:
+        print(f"\n{len(paths)} copies of {format_size(size)} ({format_size(size * (len(paths) - 1))} reclaimable):")
+        for path in paths:
+            print(f"- {path}")
+
+
+def print_estimates(rows, root_dir):
+    """Print estimated subdirectory sizes with their 95% confidence intervals."""
+    print(f"Estimated largest subdirectories in '{root_dir}' (95% confidence):")
+    for dir_path, estimate, low, high in rows:
+        if low == high:
+            print(f"- {dir_path}: {format_size(int(estimate))} (exact)")
+        else:
+            spread = 100.0 * (high - estimate) / estimate if estimate else float("inf")
+            print(f"- {dir_path}: ~{format_size(int(estimate))} ±{spread:.0f}% "
+                  f"({format_size(int(low))} - {format_size(int(high))})")
+
+
+def print_ranking(result):
+    """Print one watch-mode update: the current largest subdirectories and the total."""
+    print(f"\n[{time.strftime('%H:%M:%S')}] '{result.root_dir}': {format_size(result.total_size)}")
+    for dir_path, size in result.dirs:
+        print(f"- {dir_path}: {format_size(size)}")
+
+
+def read_paths_file(path):
+    """
+    Read roots from a file with one path per line, optionally followed by a tab and a
+    priority (higher is scanned first). Blank lines and lines starting with '#' are skipped.
+    Returns (paths, priorities).
+    """
+    paths = []
+    priorities = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.rstrip("\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            root, sep, priority = line.rpartition("\t")
+            if not sep:
+                root, priority = line, "0"
+            paths.append(root.strip())
+            priorities.append(float(priority))
+    return paths, priorities
+
+
+def result_record(result, elapsed):
+    """One JSON Lines record for a finished root."""
+    return {
+        "root": result.root_dir,
+        "total_size": result.total_size,
+        "subdir_count": result.subdir_count,
+        "dirs": [{"path": p, "size": size} for p, size in result.dirs],
+        "files": [{"path": p, "size": size} for p, size in result.files],
+        "elapsed_s": round(elapsed, 3),
+        "approximate": result.approximate,
+    }
+
+
+def print_root_result(result, elapsed):
+    """Print one root of a batch scan as it finishes."""
+    state = " (approximate, sizes are lower bounds)" if result.approximate else ""
+    print(f"\n'{result.root_dir}': {format_size(result.total_size)} in {result.subdir_count} subdirectories, "
+          f"finished after {elapsed:.2f}s{state}")
+    for dir_path, size in result.dirs:
+        print(f"- {dir_path}: {format_size(size)}")
+    if result.files:
+        print("  Largest files:")
+        for file_path, size in result.files:
+            print(f"  - {file_path}: {format_size(size)}")
+
+
+def print_file_types(types, num_types):
+    """Print the per-extension and per-size-bucket histograms of a file_types scan."""
+    rows = types.extensions(num_types)
+    print(f"\nTop {len(rows)} file types by size:")
+    for ext, count, size in rows:
+        print(f"- {ext or '(no extension)'}: {format_size(size)} in {count:,} files")
+    print("\nFiles by size:")
+    for low, high, count, size in types.size_buckets():
+        span = "empty" if high == 1 else f"{format_size(low)} - {format_size(high)}"
+        print(f"- {span}: {count:,} files, {format_size(size)}")
+
+def main(argv=None, prog=None):
+    """Parse argv (None => sys.argv) and run the requested scan; prog names the command in usage messages."""
+    parser = argparse.ArgumentParser(prog=prog, description="Find largest subdirectories and files.")
+    parser.add_argument("-p", "--path", action="append", default=[],
+                        help="Root directory to scan (required unless --diff or --paths-file is given); "
+                             "repeat to scan several roots on one shared worker pool")
+    parser.add_argument("--paths-file", metavar="FILE",
+                        help="Read roots from FILE, one per line, each optionally followed by a tab and a "
+                             "priority (higher is scanned first)")
+    parser.add_argument("--json", action="store_true",
+                        help="Print one JSON object per root (JSON Lines) as each root finishes")
+    parser.add_argument("--return-folders-num", dest="folders_num", type=int, default=10,
+                        help="Number of largest subdirectories to return (default: 10)")
+    parser.add_argument("--return-files-num", dest="files_num", type=int, default=10,
+                        help="Number of largest files to return (default: 10)")
+    parser.add_argument("--index", nargs="?", const=_DEFAULT_PATH, default=None, metavar="DB",
+                        help="Reuse and update a persistent scan index so unchanged directories are not re-read "
+                             "(default DB: ~/.sizefinder-index.sqlite)")
+    parser.add_argument("--backend", choices=("threads", "processes"), default="threads",
+                        help="Scan with worker threads (default) or worker processes (uses all cores)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker threads/processes (default: automatic)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Grow and shrink the number of active worker threads from measured throughput while "
+                             "scanning (--workers becomes the ceiling)")
+    parser.add_argument("--max-iops", type=float, default=None, metavar="N",
+                        help="Limit the scan to N filesystem operations (listings + stat calls) per second")
+    parser.add_argument("--target-latency", type=float, default=None, metavar="MS",
+                        help="With --adaptive, back off whenever an operation takes longer than MS milliseconds "
+                             "on average (protects shared/network filesystems)")
+    parser.add_argument("--disk-usage", action="store_true",
+                        help="Also report allocated size on disk (st_blocks, hard links counted once) next to apparent size")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="Skip files and whole directories matching GLOB (name, or path relative to the root "
+                             "if it contains '/'); repeatable, e.g. --exclude .git --exclude node_modules")
+    parser.add_argument("--include", action="append", default=[], metavar="GLOB",
+                        help="Only count files matching GLOB; repeatable (directories are still descended)")
+    parser.add_argument("--max-depth", type=int, default=None, metavar="N",
+                        help="Do not descend below N directory levels (1 = immediate subdirectories only)")
+    parser.add_argument("--min-size", type=int, default=0, metavar="BYTES",
+                        help="Ignore files smaller than BYTES")
+    parser.add_argument("-x", "--one-file-system", action="store_true",
+                        help="Do not descend into directories on other filesystems (mount points)")
+    parser.add_argument("--file-types", nargs="?", type=int, const=10, default=None, metavar="N",
+                        help="Also report the N file extensions using the most space (default N: 10) "
+                             "and a file size histogram, from the same walk")
+    parser.add_argument("--duplicates", nargs="?", type=int, const=10, default=None, metavar="N",
+                        help="Instead of the size report, find files with identical content and list the N groups "
+                             "wasting the most space (default N: 10). Honours the filters and --workers")
+    parser.add_argument("--time-budget", type=float, default=None, metavar="SECONDS",
+                        help="Stop after SECONDS and report the partial (approximate) results gathered so far")
+    parser.add_argument("--estimate", nargs="?", type=float, const=10.0, default=None, metavar="SECONDS",
+                        help="Instead of a full scan, estimate subdirectory sizes by sampling random paths for at most "
+                             "SECONDS (default: 10), stopping early once within --estimate-error")
+    parser.add_argument("--estimate-error", type=float, default=5.0, metavar="PCT",
+                        help="Target confidence-interval half-width for --estimate, in percent (default: 5; "
+                             "0 refines until every size is exact)")
+    parser.add_argument("--watch", action="store_true",
+                        help="After the initial scan, keep the folder ranking current from filesystem change "
+                             "notifications (inotify; mtime polling elsewhere) and print it whenever it changes. "
+                             "Ctrl+C stops")
+    parser.add_argument("--poll-interval", type=float, default=2.0, metavar="SECONDS",
+                        help="Seconds between checks for --watch when inotify is not available (default: 2)")
+    parser.add_argument("--checkpoint", nargs="?", const=_DEFAULT_PATH, default=None, metavar="FILE",
+                        help="Save scan progress to FILE periodically and on Ctrl+C so the scan can be resumed "
+                             "(default FILE: ~/.sizefinder-checkpoint)")
+    parser.add_argument("--checkpoint-interval", type=float, default=60.0, metavar="SECONDS",
+                        help="Seconds between checkpoints (default: 60)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the interrupted scan saved in the --checkpoint file instead of starting over")
+    parser.add_argument("--save-snapshot", metavar="FILE",
+                        help="Save the directory size tree and largest files to FILE (packed, memory-mappable)")
+    parser.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"),
+                        help="Compare two saved snapshots and list the fastest-growing directories, without scanning")
+    parser.add_argument("--stats", action="store_true",
+                        help="Print scan statistics: counts, errors by errno, readdir/stat time, phases, worker utilisation")
+    parser.add_argument("--browse", action="store_true",
+                        help="After the scan, drill into any folder level interactively (no rescan)")
+    args = parser.parse_args(argv)
+    if args.index == _DEFAULT_PATH:
+        from utils.index import DEFAULT_INDEX_PATH
+        args.index = DEFAULT_INDEX_PATH
+    if args.checkpoint == _DEFAULT_PATH or (args.resume and args.checkpoint is None):
+        from utils.checkpoint import DEFAULT_CHECKPOINT_PATH
+        args.checkpoint = DEFAULT_CHECKPOINT_PATH
+
+    if args.diff:
+        try:
+            print_diff(args.diff[0], args.diff[1], max(0, args.folders_num))
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            raise SystemExit(1)
+        raise SystemExit(0)
+    roots = [os.path.abspath(os.path.expanduser(p)) for p in args.path]
+    priorities = [0.0] * len(roots)
+    if args.paths_file:
+        try:
+            file_roots, file_priorities = read_paths_file(args.paths_file)
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot read --paths-file: {e}")
+        roots += [os.path.abspath(os.path.expanduser(p)) for p in file_roots]
+        priorities += file_priorities
+    if not roots:
+        parser.error("the following arguments are required: -p/--path")
+    batch = len(roots) > 1 or args.paths_file is not None or args.json
+    if batch and (args.index is not None or args.disk_usage or args.backend == "processes" or args.checkpoint
+                  or args.resume or args.save_snapshot or args.browse or args.duplicates is not None
+                  or args.estimate is not None or args.watch):
+        parser.error("several roots, --paths-file and --json cannot be combined with --index, --disk-usage, "
+                     "--backend processes, --checkpoint/--resume, --save-snapshot, --browse, --duplicates, "
+                     "--estimate or --watch")
+
+    if args.backend == "processes" and args.index is not None:
+        parser.error("--index cannot be combined with --backend processes")
+    if args.disk_usage and (args.index is not None or args.backend == "processes"):
+        parser.error("--disk-usage cannot be combined with --index or --backend processes")
+
+    throttle = None
+    if args.adaptive or args.max_iops is not None:
+        if args.backend == "processes":
+            parser.error("--adaptive/--max-iops cannot be combined with --backend processes")
+        if args.max_iops is not None and args.max_iops <= 0:
+            parser.error("--max-iops must be positive")
+        from utils.throttle import ScanThrottle
+
+        throttle = ScanThrottle(adaptive=args.adaptive, max_iops=args.max_iops,
+                                target_latency=args.target_latency / 1000 if args.target_latency else None)
+    elif args.target_latency is not None:
+        parser.error("--target-latency requires --adaptive")
+
+    if args.checkpoint is not None and (args.index is not None or args.disk_usage or args.backend == "processes"):
+        parser.error("--checkpoint/--resume cannot be combined with --index, --disk-usage or --backend processes")
+
+    filters = None
+    if args.exclude or args.include or args.max_depth is not None or args.min_size > 0 or args.one_file_system:
+        if args.index is not None:
+            parser.error("--index cannot be combined with --exclude/--include/--max-depth/--min-size/--one-file-system")
+        from utils.filters import ScanFilter
+
+        filters = ScanFilter(include=args.include, exclude=args.exclude, max_depth=args.max_depth,
+                             min_size=args.min_size, one_filesystem=args.one_file_system)
+
+    start_total = time.perf_counter()
+
+    # sanitize requested numbers
+    folders_requested = max(0, args.folders_num)
+    files_requested = max(0, args.files_num)
+
+    if batch:
+        import json
+
+        # All roots share one bounded worker pool; each is reported as soon as it is done
+        stats = ScanStats() if args.stats else None
+        cancel_event = threading.Event()
+
+        def interrupt(signum, frame):
+            cancel_event.set()
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+
+        signal.signal(signal.SIGINT, interrupt)
+        if not args.json:
+            print(f"Working: scanning {len(roots)} roots on a shared pool "
+                  f"(returning top {folders_requested} folders and top {files_requested} files each)...")
+        missing = {root for root in roots if not os.path.isdir(root)}
+        output_lock = threading.Lock()
+        t0 = time.perf_counter()
+
+        def report(index, result):
+            elapsed = time.perf_counter() - t0
+            with output_lock:
+                if args.json:
+                    record = result_record(result, elapsed)
+                    if result.root_dir in missing:
+                        record["error"] = "not a valid directory"
+                    print(json.dumps(record), flush=True)
+                elif result.root_dir not in missing:
+                    print_root_result(result, elapsed)
+
+        scan_roots(roots, folders_requested, files_requested, max_workers=args.workers,
+                   cancel_event=cancel_event, priorities=priorities, on_result=report, stats=stats,
+                   filters=filters, throttle=throttle, time_budget=args.time_budget)
+        if not args.json:
+            for root in sorted(missing):
+                print(f"\nError: '{root}' is not a valid directory.")
+            if stats is not None:
+                print("\n" + stats.format())
+            print(f"\nTotal elapsed time: {time.perf_counter() - start_total:.2f}s")
+        raise SystemExit(1 if missing else 0)
+
+    target_directory = roots[0]
+
+    if not os.path.isdir(target_directory):
+        print(f"Error: '{target_directory}' is not a valid directory.")
+        raise SystemExit(1)
+
+    if args.duplicates is not None:
+        print(f"Working: looking for duplicate files under '{target_directory}'...")
+        t0 = time.perf_counter()
+        groups = find_duplicates(target_directory, min_size=max(1, args.min_size), max_workers=args.workers,
+                                 filters=filters)
+        print(f"Finished in {time.perf_counter() - t0:.2f}s.")
+        print_duplicates(groups, max(0, args.duplicates))
+        print(f"\nTotal elapsed time: {time.perf_counter() - start_total:.2f}s")
+        raise SystemExit(0)
+
+    if args.estimate is not None:
+        print(f"Working: estimating subdirectory sizes under '{target_directory}' "
+              f"(up to {args.estimate:g}s, target ±{args.estimate_error:g}%)...")
+        t0 = time.perf_counter()
+        rows = estimate_largest_directories(target_directory, folders_requested, time_budget=args.estimate,
+                                            rel_error=max(0.0, args.estimate_error) / 100, max_workers=args.workers,
+                                            filters=filters)
+        print(f"Finished in {time.perf_counter() - t0:.2f}s.")
+        print_estimates(rows, target_directory)
+        print(f"\nTotal elapsed time: {time.perf_counter() - start_total:.2f}s")
+        raise SystemExit(0)
+
+    if args.watch:
+        print(f"Working: scanning '{target_directory}', then watching for changes (Ctrl+C to stop)...")
+        stop = threading.Event()
+        signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+        from utils.watch import watch
+
+        watch(target_directory, folders_requested, cancel_event=stop, on_update=print_ranking, filters=filters,
+              poll_interval=args.poll_interval, max_workers=args.workers)
+        print(f"\nStopped watching after {time.perf_counter() - start_total:.2f}s.")
+        raise SystemExit(0)
+
+    # single pass: folder totals and largest files come from the same walk
+    print(f"Working: scanning '{target_directory}' "
+          f"(returning top {folders_requested} folders and top {files_requested} files)...")
+    stats = ScanStats() if args.stats else None
+    # The first Ctrl+C stops the walk cleanly (partial results, final checkpoint); a second one aborts
+    cancel_event = threading.Event()
+
+    def interrupt(signum, frame):
+        cancel_event.set()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    signal.signal(signal.SIGINT, interrupt)
+    if args.resume:
+        print(f"Resuming from checkpoint '{args.checkpoint}' if present...")
+    t0 = time.perf_counter()
+    result = scan(target_directory, num_dirs=folders_requested, num_files=files_requested,
+                  index_path=args.index, backend=args.backend, max_workers=args.workers,
+                  disk_usage=args.disk_usage, stats=stats, file_types=args.file_types is not None,
+                  filters=filters, cancel_event=cancel_event, checkpoint_path=args.checkpoint,
+                  checkpoint_interval=args.checkpoint_interval, resume=args.resume, throttle=throttle,
+                  time_budget=args.time_budget)
+    t1 = time.perf_counter()
+    if not result.approximate:
+        print(f"Finished scanning {result.subdir_count} subdirectories in {t1 - t0:.2f}s.")
+    else:
+        reason = "Interrupted" if cancel_event.is_set() else "Time budget reached"
+        print(f"{reason} after {t1 - t0:.2f}s; partial results follow (approximate, sizes are lower bounds).")
+        if args.checkpoint is not None:
+            print(f"Progress saved to '{args.checkpoint}'. Run again with --resume to continue.")
+    if args.index is not None:
+        print(f"Reused {result.reused_dirs} unchanged directories from the index '{args.index}'.")
+
+    largest_dirs = result.dirs
+    if result.subdir_count == 0:
+        print("No immediate subdirectories found.")
+    elif largest_dirs:
+        actual_folders = len(largest_dirs)
+        print(f"Top {actual_folders} largest subdirectories in '{target_directory}':")
+        for dir_path, size in largest_dirs:
+            if result.dir_usage is not None:
+                print(f"- {dir_path}: {format_size(size)} (on disk: {format_size(result.dir_usage[dir_path])})")
+            else:
+                print(f"- {dir_path}: {format_size(size)}")
+    elif folders_requested == 0:
+        print("Skipping folder listing (requested 0).")
+    else:
+        print("No subdirectories found or an error occurred.")
+
+    largest_files = result.files
+    if files_requested == 0:
+        print("\nSkipping file listing (requested 0).")
+    elif largest_files:
+        actual_files = len(largest_files)
+        print(f"\nTop {actual_files} largest files in '{target_directory}':")
+        for file_path, size in largest_files:
+            print(f"- {file_path}: {format_size(size)}")
+    else:
+        print("\nNo files found or an error occurred.")
+
+    if result.total_usage is not None:
+        print(f"\nTotal: {format_size(result.total_size)} apparent, {format_size(result.total_usage)} on disk")
+
+    if result.types is not None:
+        print_file_types(result.types, max(0, args.file_types))
+
+    if stats is not None:
+        print("\n" + stats.format())
+        if throttle is not None and throttle.history:
+            counts = [workers for _, workers, _, _ in throttle.history]
+            print(f"  adaptive workers: {min(counts)}-{max(counts)}, {counts[-1]} at the end "
+                  f"({len(counts)} adjustments)")
+
+    if args.save_snapshot:
+        from utils.snapshot import save_snapshot
+
+        save_snapshot(args.save_snapshot, result)
+        print(f"\nSaved snapshot to '{args.save_snapshot}'.")
+
+    end_total = time.perf_counter()
+    print(f"\nTotal elapsed time: {end_total - start_total:.2f}s")
+
+    if args.browse and result.tree is not None:
+        browse(result.tree, folders_requested)
@@ -0,0 +1,103 @@
+"""
+Staged content hashing for the duplicate finder.
+Files that already share a size are compared by a hash of their first and last
+few KiB, and only files that still collide are hashed in full, so most bytes of
+a large share are never read.
+"""
+
+import hashlib
+import threading
+
+# Bytes read from each end of a file for the partial hash
+EDGE_BYTES = 4096
+
+# Read size for full hashes; large reads keep the hash loop out of Python
+BLOCK_BYTES = 1 << 20
+
+_local = threading.local()
+
+
+def _buffer():
+    # One reusable read buffer per pool thread
+    buf = getattr(_local, "buffer", None)
+    if buf is None:
+        buf = _local.buffer = memoryview(bytearray(BLOCK_BYTES))
+    return buf
+
+
+def edge_hash(path, size):
+    """Return a digest of the first and last EDGE_BYTES of path (the whole file if it is smaller)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb", buffering=0) as fh:
+        if size <= 2 * EDGE_BYTES:
+            h.update(fh.read())
+        else:
+            h.update(fh.read(EDGE_BYTES))
+            fh.seek(size - EDGE_BYTES)
+            h.update(fh.read(EDGE_BYTES))
+    return h.digest()
+
+
+def full_hash(path, cancel_event=None):
+    """Return a digest of path's whole content (None if cancel_event is set while reading)."""
+    h = hashlib.blake2b(digest_size=32)
+    buf = _buffer()
+    with open(path, "rb", buffering=0) as fh:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            n = fh.readinto(buf)
+            if not n:
+                break
+            # hashlib drops the GIL for large updates, so pool threads hash in parallel
+            h.update(buf[:n])
+    return h.digest()
+
+
+def _regroup(groups, digest, executor, cancel_event):
+    """
+    Split each same-key group of (size, paths) by digest(path, size), keeping sub-groups of two or more.
+    Unreadable files are dropped.
+    """
+    def task(size, path):
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        try:
+            return digest(path, size)
+        except OSError:
+            return None
+
+    jobs = [(size, path, executor.submit(task, size, path)) for size, paths in groups for path in paths]
+    split = {}
+    for size, path, fut in jobs:
+        key = fut.result()
+        if key is not None:
+            split.setdefault((size, key), []).append(path)
+    return [(size, paths) for (size, _), paths in split.items() if len(paths) > 1]
+
+
+def group_by_content(candidates, max_workers=None, cancel_event=None):
+    """
+    Find files with identical content among same-size candidates.
+
+    Args:
+        candidates (iterable): (size_in_bytes, [path, ...]) groups of two or more same-size files.
+        max_workers (int|None): Hashing threads (None => min(32, CPUs + 4), as for thread pools).
+        cancel_event (threading.Event|None): If set, stops hashing early (partial results).
+
+    Returns:
+        list: (size_in_bytes, [path, ...]) groups of identical files.
+    """
+    import concurrent.futures
+
+    groups = [(size, list(paths)) for size, paths in candidates if len(paths) > 1]
+    if not groups:
+        return []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Stage 1: first/last EDGE_BYTES. For small files this already covers every byte.
+        groups = _regroup(groups, edge_hash, executor, cancel_event)
+        small = [g for g in groups if g[0] <= 2 * EDGE_BYTES]
+        large = [g for g in groups if g[0] > 2 * EDGE_BYTES]
+        # Stage 2: full content, only for files whose edges still match
+        large = _regroup(large, lambda path, size: full_hash(path, cancel_event), executor, cancel_event)
+    return small + large
@@ -0,0 +1,245 @@
+"""
+Sampling-based size estimation.
+Each probe walks one random path down a directory tree and extrapolates the
+tree's total from the branching factors it passes (Knuth's estimator). Listings
+are kept, and subtrees that have been listed completely contribute their exact
+size, so repeated probes tighten the estimate until it becomes an exact scan.
+"""
+
+import math
+import os
+import random
+import threading
+
+from utils.finder import _until_cancelled
+
+# Probes per top-level directory before its confidence interval is trusted. Probe
+# estimates are heavy-tailed (a rare probe finds the one huge subtree), so a handful
+# of samples badly understates the spread.
+MIN_SAMPLES = 16
+
+# Normal quantile for the reported 95% confidence intervals
+_Z = 1.96
+
+
+class _Stratum:
+    """Probe results for one top-level directory."""
+
+    __slots__ = ("path", "n", "total", "total_sq")
+
+    def __init__(self, path):
+        self.path = path
+        self.n = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def add(self, estimate):
+        self.n += 1
+        self.total += estimate
+        self.total_sq += estimate * estimate
+
+    def mean(self):
+        return self.total / self.n if self.n else 0.0
+
+    def half_width(self):
+        """Half the 95% confidence interval of the mean (inf until there are two samples)."""
+        if self.n < 2:
+            return math.inf
+        var = max(0.0, (self.total_sq - self.total * self.total / self.n) / (self.n - 1))
+        return _Z * math.sqrt(var / self.n)
+
+
+class SizeEstimator:
+    """
+    Shared sampling state for the top-level directories of one root.
+
+    Probes may run on several threads at once: listings and completed totals are only
+    ever added (a directory listed twice by a race yields the same data), and the
+    per-directory statistics are updated under a lock.
+    """
+
+    def __init__(self, subdirs, pruner=None, seed=None):
+        """
+        Args:
+            subdirs (list): Top-level directory paths to estimate.
+            pruner (_Pruner|None): Bound ScanFilter applied to every listing.
+            seed (int|None): Seed for reproducible probe paths (None => random).
+        """
+        self.strata = [_Stratum(p) for p in subdirs]
+        self.pruner = pruner
+        self.seed = seed
+        # path -> (bytes of the files directly in it, [subdirectory paths])
+        self.listings = {}
+        # path -> exact total for directories whose whole subtree has been listed
+        self.done = {}
+        self.lock = threading.Lock()
+        self._turn = 0
+
+    def _list(self, path, cancel_event=None):
+        """(own bytes, subdirectory paths) of path, memoised; None if cancel_event cut the listing short."""
+        listing = self.listings.get(path)
+        if listing is not None:
+            return listing
+        pruner = self.pruner
+        own = 0
+        children = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it if cancel_event is None else _until_cancelled(it, cancel_event):
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if pruner is None or not pruner.skip_dir(entry):
+                                children.append(entry.path)
+                            continue
+                        if entry.is_symlink():
+                            continue
+                        size = entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+                    if pruner is None or not pruner.skip_file(entry, size):
+                        own += size
+        except OSError:
+            # Unreadable or vanished: counts as an empty leaf (whatever was read is kept)
+            pass
+        if cancel_event is not None and cancel_event.is_set():
+            # Possibly partial: never memoised, or it would later count as exact
+            return None
+        listing = self.listings[path] = (own, children)
+        return listing
+
+    def probe(self, top, rng, cancel_event=None):
+        """
+        Walks one random path down from top; returns an unbiased estimate of top's total
+        (None when cancel_event stopped it).
+
+        At every directory the exact totals of completed children are added and one of
+        the remaining children is followed, weighted by how many remained. The walk ends
+        at a directory without unfinished children, which (with any ancestors that are
+        now finished too) is recorded as complete, so every probe completes at least one
+        directory and enough probes amount to a full scan.
+        """
+        done = self.done
+        path = []
+        weight = 1
+        estimate = 0
+        node = top
+        while True:
+            exact = done.get(node)
+            if exact is not None:
+                estimate += weight * exact
+                break
+            listing = self._list(node, cancel_event)
+            if listing is None:
+                return None
+            own, children = listing
+            path.append(node)
+            estimate += weight * own
+            pending = []
+            for child in children:
+                exact = done.get(child)
+                if exact is None:
+                    pending.append(child)
+                else:
+                    estimate += weight * exact
+            if not pending:
+                break
+            weight *= len(pending)
+            node = rng.choice(pending)
+
+        for node in reversed(path):
+            own, children = self.listings[node]
+            total = own
+            for child in children:
+                exact = done.get(child)
+                if exact is None:
+                    return estimate
+                total += exact
+            done[node] = total
+        return estimate
+
+    def next_stratum(self):
+        """
+        Index of the directory to probe next (None when all are exact).
+
+        Every other probe goes to the directory whose estimate is least certain in bytes;
+        the rest go round-robin, so a directory whose few probes happened to miss its big
+        subtree (and so looks small and certain) keeps being sampled.
+        """
+        strata = self.strata
+        done = self.done
+        with self.lock:
+            self._turn += 1
+            turn = self._turn
+            best = None
+            best_width = -1.0
+            for i, stratum in enumerate(strata):
+                if stratum.path in done:
+                    continue
+                if stratum.n < MIN_SAMPLES:
+                    return i
+                width = stratum.half_width()
+                if width > best_width:
+                    best, best_width = i, width
+            if best is None or turn % 2:
+                return best
+            for k in range(len(strata)):
+                i = (turn // 2 + k) % len(strata)
+                if strata[i].path not in done:
+                    return i
+        return best
+
+    def record(self, index, estimate):
+        with self.lock:
+            self.strata[index].add(estimate)
+
+    def results(self):
+        """Returns (directory_path, estimate, low, high) per directory; low == high once it is exact."""
+        rows = []
+        with self.lock:
+            for stratum in self.strata:
+                exact = self.done.get(stratum.path)
+                if exact is not None:
+                    rows.append((stratum.path, exact, exact, exact))
+                    continue
+                mean = stratum.mean()
+                width = stratum.half_width()
+                # Sizes cannot be negative
+                rows.append((stratum.path, mean, max(0.0, mean - width), mean + width))
+        return rows
+
+    def precise_enough(self, rel_error):
+        """
+        True when every directory is exact, or sampled enough that its interval is within
+        rel_error of its estimate; directories that cannot reach rel_error of the largest
+        estimate are negligible for the ranking and ignored.
+        """
+        rows = self.results()
+        if not rows:
+            return True
+        largest = max(r[1] for r in rows)
+        with self.lock:
+            counts = {s.path: s.n for s in self.strata}
+        for path, estimate, low, high in rows:
+            if low == high:
+                continue
+            if counts[path] < MIN_SAMPLES:
+                return False
+            if high < rel_error * largest:
+                continue
+            if high - estimate > rel_error * estimate:
+                return False
+        return True
+
+    def run_worker(self, rank, cancel_event):
+        """
+        Probe loop for one thread; stops when cancel_event is set (it is also polled inside
+        listings) or every directory is exact.
+        """
+        rng = random.Random(None if self.seed is None else self.seed * 1000003 + rank)
+        while not cancel_event.is_set():
+            index = self.next_stratum()
+            if index is None:
+                return
+            estimate = self.probe(self.strata[index].path, rng, cancel_event)
+            if estimate is not None:
+                self.record(index, estimate)
@@ -0,0 +1,124 @@
+"""
+Traversal-time pruning for the finder walkers.
+A ScanFilter decides which directories are descended into and which files are
+counted, from readdir data where possible, so excluded subtrees are never read.
+"""
+
+import fnmatch
+import os
+import re
+
+# Globs follow the platform's filename case rules (case-insensitive on Windows)
+_GLOB_FLAGS = re.IGNORECASE if os.path.normcase("A") == "a" else 0
+
+
+def _compile(patterns):
+    """
+    Compile globs into (name_match, path_match) callables (None when there are none).
+
+    Globs without a "/" match entry names; globs with one match the path relative to
+    the scan root, written with "/" separators. A trailing "/" is ignored.
+    """
+    names = []
+    paths = []
+    for pattern in patterns:
+        pattern = pattern.rstrip("/")
+        if not pattern:
+            continue
+        if "/" in pattern:
+            paths.append(pattern.lstrip("/"))
+        else:
+            names.append(pattern)
+
+    def join(globs):
+        if not globs:
+            return None
+        return re.compile("|".join(fnmatch.translate(g) for g in globs), _GLOB_FLAGS).match
+
+    return join(names), join(paths)
+
+
+class ScanFilter:
+    """Pruning options shared by the finder functions (pass as ``filters=``)."""
+
+    def __init__(self, include=(), exclude=(), max_depth=None, min_size=0, one_filesystem=False):
+        """
+        Args:
+            include (iterable): Globs a file must match to be counted (empty => every file).
+                Directories are still descended into.
+            exclude (iterable): Globs for files and directories to skip; a matching
+                directory's whole subtree is pruned.
+            max_depth (int|None): Deepest directory level to descend into; immediate
+                subdirectories of the root are level 1 and 0 counts only the root's own files
+                (None => no limit).
+            min_size (int): Files smaller than this many bytes are not counted.
+            one_filesystem (bool): Do not descend into directories on another device than
+                the root (mount points such as /proc or network shares).
+        """
+        self.include = tuple(include)
+        self.exclude = tuple(exclude)
+        self.max_depth = max_depth
+        self.min_size = min_size
+        self.one_filesystem = one_filesystem
+
+    def options(self):
+        """The settings as a plain tuple (compared when resuming a checkpoint)."""
+        return (self.include, self.exclude, self.max_depth, self.min_size, self.one_filesystem)
+
+    def bind(self, root_dir):
+        """Return the per-scan pruner for a walk rooted at root_dir."""
+        return _Pruner(self, root_dir)
+
+
+class _Pruner:
+    """A ScanFilter bound to one root: compiled globs, root depth and root device."""
+
+    __slots__ = ("root_len", "max_depth", "min_size", "root_dev",
+                 "exclude_name", "exclude_path", "include_name", "include_path")
+
+    def __init__(self, filters, root_dir):
+        # Offset of the first character below the root in any path under it
+        self.root_len = len(root_dir.rstrip(os.sep)) + 1
+        self.max_depth = filters.max_depth
+        self.min_size = filters.min_size
+        self.root_dev = os.stat(root_dir).st_dev if filters.one_filesystem else None
+        self.exclude_name, self.exclude_path = _compile(filters.exclude)
+        self.include_name, self.include_path = _compile(filters.include)
+
+    def _relative(self, path):
+        rel = path[self.root_len:]
+        return rel.replace(os.sep, "/") if os.sep != "/" else rel
+
+    def skip_dir(self, entry):
+        """True when the subdirectory entry (an os.DirEntry) must not be descended into."""
+        if self.max_depth is not None and entry.path.count(os.sep, self.root_len) + 1 > self.max_depth:
+            return True
+        if self.exclude_name is not None and self.exclude_name(entry.name):
+            return True
+        if self.exclude_path is not None and self.exclude_path(self._relative(entry.path)):
+            return True
+        if self.root_dev is not None:
+            # Directory entries carry no device number, so this costs one lstat per directory.
+            # On Windows DirEntry.stat() always reports st_dev 0; os.stat fills it in.
+            try:
+                dev = entry.stat(follow_symlinks=False).st_dev
+                if not dev:
+                    dev = os.stat(entry.path, follow_symlinks=False).st_dev
+                return dev != self.root_dev
+            except OSError:
+                return True
+        return False
+
+    def skip_file(self, entry, size):
+        """True when the file entry (an os.DirEntry of the given size) must not be counted."""
+        if size < self.min_size:
+            return True
+        if self.exclude_name is not None and self.exclude_name(entry.name):
+            return True
+        if self.exclude_path is not None and self.exclude_path(self._relative(entry.path)):
+            return True
+        if self.include_name is None and self.include_path is None:
+            return False
+        if self.include_name is not None and self.include_name(entry.name):
+            return False
+        return not (self.include_path is not None and self.include_path(self._relative(entry.path)))
@@ -1,34 +1,268 @@
 # ...existing code...
 import os
-import concurrent.futures
 # argparse removed per user request
+import collections
+import errno
 import heapq
+import itertools
+import threading
 import time
+from array import array
 
-def get_directory_size(path, cancel_event=None):
-    """Calculates the total size of a directory in bytes."""
-    total_size = 0
-    for dirpath, dirnames, filenames in os.walk(path, onerror=lambda e: None, followlinks=False):
+from utils.histogram import FileTypeHistogram
+from utils.sizetree import SizeTree
+
+# Mask for how often walkers poll the cancel flag inside one directory listing
+# (every 32 entries: milliseconds even in huge or slow directories)
+_CANCEL_CHECK = 31
+
+def _until_cancelled(it, cancel_event):
+    """Yields the entries of the scandir iterator it, stopping early once cancel_event is set."""
+    for i, entry in enumerate(it):
+        if not i & _CANCEL_CHECK and cancel_event.is_set():
+            return
+        yield entry
+
+def _iter_files(path, cancel_event=None, wstats=None, pruner=None):
+    """
+    Yields (size_in_bytes, dir_entry) for every regular file under path.
+
+    Uses os.scandir so directory/symlink checks come from the readdir data and each file
+    costs a single lstat (DirEntry.stat with follow_symlinks=False). Callers read
+    dir_entry.path only for the files they keep. wstats (a _WorkerStats) gets coarse
+    counters: directories, files, stat calls, bytes and errors. pruner (a ScanFilter bound
+    to path) drops directories before they are listed and files before they are yielded.
+    cancel_event is also polled inside large directories (every _CANCEL_CHECK entries).
+    """
+    stack = [path]
+    while stack:
         if cancel_event is not None and cancel_event.is_set():
-            break
-        
-        for f in filenames:
-            if cancel_event is not None and cancel_event.is_set():
-                break
+            return
+        try:
+            it = os.scandir(stack.pop())
+        except OSError as e:
+            # Unreadable directory (permissions, vanished while walking)
+            if wstats is not None:
+                wstats.error(e)
+            continue
+        if wstats is not None:
+            wstats.dirs += 1
+        try:
+            with it:
+                for entry in it if cancel_event is None else _until_cancelled(it, cancel_event):
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if pruner is None or not pruner.skip_dir(entry):
+                                stack.append(entry.path)
+                            continue
+                        # Skip symbolic links
+                        if entry.is_symlink():
+                            continue
+                        size = entry.stat(follow_symlinks=False).st_size
+                    except OSError as e:
+                        # Handle cases where files might be inaccessible or vanished
+                        if wstats is not None:
+                            wstats.stat_calls += 1
+                            wstats.error(e)
+                        continue
+                    if pruner is not None and pruner.skip_file(entry, size):
+                        continue
+                    if wstats is not None:
+                        wstats.stat_calls += 1
+                        wstats.files += 1
+                        wstats.bytes += size
+                    yield size, entry
+        except OSError as e:
+            # Listing failed part-way; keep what was read
+            if wstats is not None:
+                wstats.error(e)
 
-            fp = os.path.join(dirpath, f)
-            # Skip symbolic links
-            if os.path.islink(fp):
-                continue
-            # Use os.path.getsize to get file size, handle potential errors
+class _TopFiles:
+    """
+    Fixed-size min-heap holding the N largest (size, path) pairs seen so far.
+
+    ``threshold`` is the size a file has to beat to get in (-1 until the heap is full),
+    so walkers can reject most files with one integer comparison and never build their
+    path. Memory stays O(N) however many files the tree holds.
+    """
+
+    __slots__ = ("num", "heap", "threshold")
+
+    def __init__(self, num):
+        self.num = num
+        self.heap = []
+        self.threshold = -1 if num > 0 else float("inf")
+
+    def push(self, size, path):
+        """Adds a file that beat ``threshold``."""
+        heap = self.heap
+        if len(heap) < self.num:
+            heapq.heappush(heap, (size, path))
+            if len(heap) < self.num:
+                return
+        else:
+            heapq.heapreplace(heap, (size, path))
+        self.threshold = heap[0][0]
+
+    def merge(self, other):
+        """Folds another selection (e.g. a worker's) into this one."""
+        if other is self:
+            return
+        for size, path in other.heap:
+            if size > self.threshold:
+                self.push(size, path)
+
+    def items(self):
+        """Returns (file_path, size_in_bytes) tuples, largest first."""
+        return [(path, size) for size, path in sorted(self.heap, reverse=True)]
+
+class _WorkerStats:
+    """Counters for one worker thread (or process) of an instrumented scan; see ScanStats."""
+
+    __slots__ = ("dirs", "files", "stat_calls", "bytes", "index_hits", "errors",
+                 "readdir_s", "stat_s", "busy_s", "idle_s")
+
+    def __init__(self):
+        self.dirs = 0
+        self.files = 0
+        self.stat_calls = 0
+        self.bytes = 0
+        self.index_hits = 0
+        self.errors = {}
+        self.readdir_s = 0.0
+        self.stat_s = 0.0
+        self.busy_s = 0.0
+        self.idle_s = 0.0
+
+    def error(self, exc):
+        """Counts a swallowed OSError under its errno."""
+        code = exc.errno or 0
+        self.errors[code] = self.errors.get(code, 0) + 1
+
+
+class ScanStats:
+    """
+    Opt-in instrumentation for the finder functions.
+
+    Pass an instance as ``stats=`` to get counts of directories, files, stat calls, bytes
+    and swallowed errors (by errno), time spent in readdir vs. stat, per-phase timings and
+    per-worker busy/idle time. Each worker updates its own _WorkerStats without locking;
+    :meth:`snapshot` sums them and is safe to call while the scan is still running.
+    Leaving ``stats`` as None keeps the walkers on their uninstrumented path.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.workers = []
+        self.phases = {}
+        self.started = time.perf_counter()
+
+    def new_worker(self):
+        """Registers and returns the counters for one more worker."""
+        wstats = _WorkerStats()
+        self.add_worker(wstats)
+        return wstats
+
+    def add_worker(self, wstats):
+        with self.lock:
+            self.workers.append(wstats)
+
+    def add_phase(self, name, seconds):
+        """Adds wall time spent in one scan phase (e.g. "walk", "tree build")."""
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def snapshot(self):
+        """
+        Returns the current totals as a dict: dirs, files, stat_calls, bytes, index_hits,
+        readdir_s, stat_s, errors ({errno: count}), phases ({name: seconds}),
+        workers ([(busy_s, idle_s), ...]) and elapsed_s.
+        """
+        with self.lock:
+            workers = list(self.workers)
+            phases = dict(self.phases)
+        totals = dict(dirs=0, files=0, stat_calls=0, bytes=0, index_hits=0, readdir_s=0.0, stat_s=0.0)
+        errors = {}
+        for w in workers:
+            for key in totals:
+                totals[key] += getattr(w, key)
+            for code, count in list(w.errors.items()):
+                errors[code] = errors.get(code, 0) + count
+        totals["errors"] = errors
+        totals["phases"] = phases
+        totals["workers"] = [(w.busy_s, w.idle_s) for w in workers]
+        totals["elapsed_s"] = time.perf_counter() - self.started
+        return totals
+
+    def format(self, brief=False):
+        """Returns a human-readable report (one line when brief)."""
+        snap = self.snapshot()
+        # Counters that were never timed (e.g. the root listing) are not pool workers
+        workers = [(b, i) for b, i in snap["workers"] if b + i]
+        busy = sum(b for b, _ in workers)
+        idle = sum(i for _, i in workers)
+        busy_pct = 100.0 * busy / (busy + idle) if busy + idle else 0.0
+        num_errors = sum(snap["errors"].values())
+        if brief:
+            line = (f"{snap['dirs']:,} dirs, {snap['files']:,} files, {format_size(snap['bytes'])}, "
+                    f"{num_errors:,} errors")
+            return line + f", workers {busy_pct:.0f}% busy" if workers else line
+
+        errors = ", ".join(f"{errno.errorcode.get(code, code)} x{count}"
+                           for code, count in sorted(snap["errors"].items(), key=lambda kv: -kv[1])) or "none"
+        phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in snap["phases"].items()) or "n/a"
+        lines = [
+            "Scan statistics:",
+            f"  directories: {snap['dirs']:,}  files: {snap['files']:,}  stat calls: {snap['stat_calls']:,}  "
+            f"bytes: {format_size(snap['bytes'])}",
+            f"  errors: {errors}",
+        ]
+        if snap["readdir_s"] or snap["stat_s"]:
+            lines.append(f"  time in readdir: {snap['readdir_s']:.2f}s  time in stat: {snap['stat_s']:.2f}s "
+                         f"(summed over workers)")
+        lines.append(f"  phases: {phases}")
+        if snap["index_hits"]:
+            lines.append(f"  directories served from the index: {snap['index_hits']:,}")
+        if workers:
+            per_worker = [100.0 * b / (b + i) for b, i in workers]
+            lines.append(f"  workers: {len(workers)}, {busy_pct:.0f}% busy, {100.0 - busy_pct:.0f}% idle "
+                         f"(min {min(per_worker):.0f}% / max {max(per_worker):.0f}% busy)")
+        return "\n".join(lines)
+
+
+def _worker_stats(stats, throttle):
+    """Counters for one more walker: registered with stats, or private when only a throttle needs them."""
+    if stats is not None:
+        return stats.new_worker()
+    return _WorkerStats() if throttle is not None else None
+
+
+def get_directory_size(path, cancel_event=None, stats=None, filters=None):
+    """Calculates the total size of a directory in bytes (stats: optional ScanStats, filters: optional ScanFilter)."""
+    t0 = time.perf_counter()
+    total_size = 0
+    wstats = stats.new_worker() if stats is not None else None
+    pruner = filters.bind(path) if filters is not None else None
+    for size, _ in _iter_files(path, cancel_event, wstats, pruner):
+        total_size += size
+    if stats is not None:
+        stats.add_phase("walk", time.perf_counter() - t0)
+    return total_size
+
+def _list_subdirs(root_dir, pruner=None):
+    """Paths of root_dir's immediate subdirectories (no symlinks) that pruner keeps; raises OSError if unreadable."""
+    subdirs = []
+    with os.scandir(root_dir) as it:
+        for entry in it:
             try:
-                total_size += os.path.getsize(fp)
+                if entry.is_dir(follow_symlinks=False) and (pruner is None or not pruner.skip_dir(entry)):
+                    subdirs.append(entry.path)
             except OSError:
-                # Handle cases where files might be inaccessible or broken links
                 pass
-    return total_size
+    return subdirs
 
-def find_largest_directories(root_dir, num_largest=10, max_workers=None, cancel_event=None):
+def find_largest_directories(root_dir, num_largest=10, max_workers=None, cancel_event=None, stats=None,
+                             filters=None, throttle=None):
     """
     Finds the largest subdirectories within a given root directory using multithreading.
 
@@ -37,6 +271,9 @@ def find_largest_directories(root_dir, num_largest=10, max_workers=None, cancel_
         num_largest (int): The number of largest directories to return.
         max_workers (int|None): Number of worker threads for parallel scanning (None => automatic).
         cancel_event (threading.Event|None): If set, stops processing futures early.
+        stats (ScanStats|None): Collects scan metrics when given.
+        filters (ScanFilter|None): Prunes directories and files while walking.
+        throttle (ScanThrottle|None): Adaptive worker count and/or I/O-rate ceiling.
 
     Returns:
         list: A list of tuples (directory_path, size_in_bytes) of the largest directories.
@@ -44,55 +281,30 @@ def find_largest_directories(root_dir, num_largest=10, max_workers=None, cancel_
     if not os.path.isdir(root_dir):
         # print(f"Error: '{root_dir}' is not a valid directory.")
         return []
+    pruner = filters.bind(root_dir) if filters is not None else None
 
+    # Prepare list of immediate subdirectories (skip symlinks)
     try:
-        entries = os.listdir(root_dir)
+        subdirs = _list_subdirs(root_dir, pruner)
     except OSError:
         # print(f"Error: cannot access directory '{root_dir}'.")
         return []
 
-    # Prepare list of immediate subdirectories (skip symlinks)
-    subdirs = []
-    for item in entries:
-        item_path = os.path.join(root_dir, item)
-        if os.path.isdir(item_path) and not os.path.islink(item_path):
-            subdirs.append(item_path)
-
     dir_sizes = {}
     if subdirs and num_largest != 0:
-        # Choose a reasonable default for max_workers
-        if max_workers is None:
-            cpu = os.cpu_count() or 1
-            max_workers = min(32, cpu * 5)
-
-        # Compute sizes in parallel
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as exc:
-            future_to_path = {exc.submit(get_directory_size, p, cancel_event): p for p in subdirs}
-            
-            
-            while future_to_path:
-            # Wait with a 1-second timeout so we check cancellation frequently
-                done, pending = concurrent.futures.wait(future_to_path.keys(), timeout=1.0)
-                
-                # Check cancellation
-                if cancel_event is not None and cancel_event.is_set():
-                    for f in pending:
-                        f.cancel()
-                    break
-                
-                # Process completed futures
-                for fut in done:
-                    p = future_to_path[fut]
-                    try:
-                        dir_sizes[p] = fut.result()
-                    except Exception:
-                        dir_sizes[p] = 0
-                    del future_to_path[fut]
-    
+        t0 = time.perf_counter()
+        ids = itertools.count(1)
+        make_walker = lambda: _Walker(0, ids, wstats=_worker_stats(stats, throttle), pruner=pruner,
+                                      cancel_event=cancel_event)
+        sizes, _, _ = _parallel_walk(subdirs, 0, max_workers, cancel_event, make_walker, ids, throttle=throttle)
+        if stats is not None:
+            stats.add_phase("walk", time.perf_counter() - t0)
+        dir_sizes = dict(zip(subdirs, sizes))
+
     sorted_dirs = sorted(dir_sizes.items(), key=lambda item: item[1], reverse=True)
     return sorted_dirs[:num_largest]
 
-def find_largest_files(root_dir, num_files=10, cancel_event=None):
+def find_largest_files(root_dir, num_files=10, cancel_event=None, stats=None, filters=None):
     """
     Finds the largest files under root_dir (recursive).
 
@@ -100,6 +312,8 @@ def find_largest_files(root_dir, num_files=10, cancel_event=None):
         root_dir (str): Path to scan.
         num_files (int): Number of largest files to return.
         cancel_event (threading.Event|None): If set, stops scanning early.
+        stats (ScanStats|None): Collects scan metrics when given.
+        filters (ScanFilter|None): Prunes directories and files while walking.
 
     Returns:
         list: A list of tuples (file_path, size_in_bytes) of the largest files.
@@ -107,27 +321,1663 @@ def find_largest_files(root_dir, num_files=10, cancel_event=None):
     if num_files == 0:
         return []
 
-    files = []
-    for dirpath, dirnames, filenames in os.walk(root_dir, onerror=lambda e: None, followlinks=False):
+    # Stream sizes through a bounded heap; paths are only read for files that make the cut
+    t0 = time.perf_counter()
+    top = _TopFiles(num_files)
+    wstats = stats.new_worker() if stats is not None else None
+    pruner = filters.bind(root_dir) if filters is not None and os.path.isdir(root_dir) else None
+    for size, entry in _iter_files(root_dir, cancel_event, wstats, pruner):
+        if size > top.threshold:
+            top.push(size, entry.path)
+    if stats is not None:
+        stats.add_phase("walk", time.perf_counter() - t0)
+    return top.items()
+
+def find_duplicates(root_dir, min_size=1, max_workers=None, cancel_event=None, filters=None):
+    """
+    Finds groups of files with identical content under root_dir (recursive).
+
+    Files are bucketed by size during the walk; only sizes seen more than once are
+    compared, first by a hash of the first/last few KiB and then, for files that still
+    match, by a full content hash (see utils/duplicates.py). Hard links to one inode
+    count as a single file.
+
+    Args:
+        root_dir (str): Path to scan.
+        min_size (int): Ignore files smaller than this many bytes (default 1 skips empty files).
+        max_workers (int|None): Number of hashing threads (None => automatic).
+        cancel_event (threading.Event|None): If set, stops scanning/hashing early.
+        filters (ScanFilter|None): Prunes directories and files while walking.
+
+    Returns:
+        list: (size_in_bytes, [file_path, ...]) groups, most reclaimable bytes first.
+    """
+    from utils.duplicates import group_by_content
+
+    if not os.path.isdir(root_dir):
+        return []
+    pruner = filters.bind(root_dir) if filters is not None else None
+
+    # Most sizes occur once, so keep a single path per size until a second one shows up
+    first = {}
+    same_size = {}
+    inodes = set()
+    for size, entry in _iter_files(root_dir, cancel_event, pruner=pruner):
+        if size < min_size:
+            continue
+        st = entry.stat(follow_symlinks=False)  # cached by the walk
+        if st.st_nlink > 1:
+            key = (st.st_dev << 64) | st.st_ino
+            if key in inodes:
+                continue
+            inodes.add(key)
+        path = entry.path
+        other = first.setdefault(size, path)
+        if other is not path:
+            group = same_size.get(size)
+            if group is None:
+                same_size[size] = [other, path]
+            else:
+                group.append(path)
+    first = inodes = None
+
+    groups = group_by_content(same_size.items(), max_workers, cancel_event)
+    for _, paths in groups:
+        paths.sort()
+    groups.sort(key=lambda g: g[0] * (len(g[1]) - 1), reverse=True)
+    return groups
+
+# Cancel flag shared with the pool's worker processes (set by _init_shard_process)
+_shard_cancel = None
+
+def _init_shard_process(cancel_event):
+    global _shard_cancel
+    _shard_cancel = cancel_event
+
+def _walk_shard(items, num_files, first_id, instrument=False, file_types=False, pruner=None):
+    """
+    Process-pool task: walks (path, slot, parent) subtrees sequentially.
+
+    Returns (sizes_by_slot, top_heap, tree_rows, worker_stats, types); node ids start at
+    first_id so they cannot collide with other shards' ids or with the parent's.
+    worker_stats is a _WorkerStats when instrument is set and types a FileTypeHistogram
+    when file_types is set, else None. pruner is the scan's bound ScanFilter, if any.
+    When the pool's cancel flag is set the shard stops and returns what it has.
+    """
+    t0 = time.perf_counter()
+    cancel = _shard_cancel
+    wstats = _WorkerStats() if instrument else None
+    walker = _Walker(num_files, itertools.count(first_id), wstats=wstats, file_types=file_types, pruner=pruner,
+                     cancel_event=cancel)
+    stack = list(items)
+    while stack:
+        if cancel is not None and cancel.is_set():
+            break
+        path, slot, parent = stack.pop()
+        walker.visit(path, slot, parent, stack)
+    if wstats is not None:
+        wstats.busy_s = time.perf_counter() - t0
+    return walker.sizes, walker.top.heap, walker.rows(), wstats, walker.types
+
+def _process_walk(subdirs, num_files, max_workers=None, cancel_event=None, stats=None, file_types=False,
+                  pruner=None):
+    """
+    Walks the given directories with a pool of worker processes, sidestepping the GIL.
+
+    The parent lists directories breadth-first until there are enough pieces to keep
+    every process busy (so one huge subdirectory is split up), then hands interleaved
+    shards of that frontier to the pool. Each process sends back only its per-slot
+    totals and its local top-N files, which are merged here.
+
+    Args:
+        subdirs (list): Directory paths whose totals are wanted.
+        num_files (int): Number of largest files to collect (0 => none).
+        max_workers (int|None): Number of worker processes (None => one per CPU).
+        cancel_event (threading.Event|None): If set, pending shards are dropped and running
+            ones stop within milliseconds, returning what they have walked.
+        stats (ScanStats|None): Receives the parent's and each shard's counters.
+        file_types (bool): Also build a FileTypeHistogram.
+        pruner (_Pruner|None): Bound ScanFilter applied by the parent and every shard.
+
+    Returns:
+        tuple: (sizes, top_files, rows, types) where sizes[i] is the total for subdirs[i],
+        top_files is the merged _TopFiles selection, rows holds the size-tree row tables and
+        types is the merged histogram (None unless file_types).
+
+    Raises:
+        Exception: Whatever a shard failed with (e.g. BrokenProcessPool when a worker process
+            dies); a partial total would otherwise pass for an exact one.
+    """
+    import concurrent.futures
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, max_workers)
+
+    # Expand the shallowest directories first; the parent's own listing work is kept
+    parent = _Walker(num_files, wstats=stats.new_worker() if stats is not None else None, file_types=file_types,
+                     pruner=pruner, cancel_event=cancel_event)
+    rows = [parent.rows()]
+    frontier = collections.deque((p, i, 0) for i, p in enumerate(subdirs))
+    target = max_workers * 16
+    budget = target * 4
+    t0 = time.perf_counter()
+    while frontier and len(frontier) < target and budget:
         if cancel_event is not None and cancel_event.is_set():
             break
-        
-        for f in filenames:
-            fp = os.path.join(dirpath, f)
-            if os.path.islink(fp):
-                continue
+        path, slot, node = frontier.popleft()
+        parent.visit(path, slot, node, frontier)
+        budget -= 1
+    if parent.wstats is not None:
+        parent.wstats.busy_s = time.perf_counter() - t0
+
+    items = list(frontier)
+    num_shards = min(len(items), max_workers * 4)
+    shards = [items[i::num_shards] for i in range(num_shards)]
+
+    if shards and not (cancel_event is not None and cancel_event.is_set()):
+        import multiprocessing
+
+        # Handed to the workers at start-up; setting it stops running shards too
+        shard_cancel = multiprocessing.Event()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, initializer=_init_shard_process,
+                                                    initargs=(shard_cancel,)) as exc:
+            # Shard ids live in disjoint ranges above anything the parent hands out
+            pending = {exc.submit(_walk_shard, shard, num_files, (i + 1) << 40, stats is not None, file_types, pruner)
+                       for i, shard in enumerate(shards)}
+            while pending:
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=0.02, return_when=concurrent.futures.FIRST_COMPLETED)
+                if cancel_event is not None and cancel_event.is_set() and not shard_cancel.is_set():
+                    shard_cancel.set()
+                    # Shards that never started are dropped; running ones return their partial walk
+                    pending = {f for f in pending if not f.cancel()}
+                for fut in done:
+                    try:
+                        shard_sizes, shard_top, shard_rows, shard_stats, shard_types = fut.result()
+                    except Exception:
+                        # A lost shard (e.g. a killed worker) would silently undercount; stop the rest and fail
+                        shard_cancel.set()
+                        raise
+                    for slot, size in shard_sizes.items():
+                        parent.sizes[slot] = parent.sizes.get(slot, 0) + size
+                    for size, path in shard_top:
+                        if size > parent.top.threshold:
+                            parent.top.push(size, path)
+                    rows.append(shard_rows)
+                    if shard_stats is not None:
+                        stats.add_worker(shard_stats)
+                    if shard_types is not None:
+                        parent.types.merge(shard_types)
+
+    sizes = [0] * len(subdirs)
+    for slot, size in parent.sizes.items():
+        sizes[slot] += size
+    return sizes, parent.top, rows, parent.types
+
+class ScanEvent:
+    """
+    One incremental update emitted while a scan runs (see :func:`iter_scan`).
+
+    Kinds:
+        DIR_DONE: an immediate subdirectory finished; ``path``/``size`` hold its total.
+        TOP_FILE: a file entered the running top-N (it may be pushed out again later).
+        PROGRESS: running totals in ``total_size`` and ``dirs_seen``.
+        DONE: the scan is over; ``result`` holds the ScanResult.
+    """
+
+    DIR_DONE = "dir_done"
+    TOP_FILE = "top_file"
+    PROGRESS = "progress"
+    DONE = "done"
+
+    __slots__ = ("kind", "path", "size", "total_size", "dirs_seen", "result")
+
+    def __init__(self, kind, path=None, size=0, total_size=0, dirs_seen=0, result=None):
+        self.kind = kind
+        self.path = path
+        self.size = size
+        self.total_size = total_size
+        self.dirs_seen = dirs_seen
+        self.result = result
+
+    def __repr__(self):
+        return f"ScanEvent({self.kind!r}, path={self.path!r}, size={self.size}, total_size={self.total_size})"
+
+
+class ScanResult:
+    """Outcome of a single :func:`scan` pass over a directory tree."""
+
+    def __init__(self, root_dir, dirs, files, subdir_count=0, total_size=0, reused_dirs=0, tree=None,
+                 total_usage=None, dir_usage=None, types=None, approximate=False):
+        """
+        Args:
+            root_dir (str): The directory that was scanned.
+            dirs (list): (directory_path, size_in_bytes) tuples of the largest immediate subdirectories.
+            files (list): (file_path, size_in_bytes) tuples of the largest files.
+            subdir_count (int): Number of immediate subdirectories found under root_dir.
+            total_size (int): Total size in bytes of every file seen under root_dir.
+            reused_dirs (int): Directories served from the scan index instead of being re-read.
+            tree (SizeTree|None): Sizes of every directory under root_dir, for drilling down without a rescan.
+            total_usage (int|None): Allocated bytes on disk under root_dir (disk-usage mode only).
+            dir_usage (dict|None): directory_path -> allocated bytes for every immediate subdirectory
+                (disk-usage mode only).
+            types (FileTypeHistogram|None): Count and bytes per extension and size bucket
+                (file_types scans only).
+            approximate (bool): The scan was cancelled or ran out of time; every figure is a
+                lower bound covering only what was walked.
+        """
+        self.root_dir = root_dir
+        self.dirs = dirs
+        self.files = files
+        self.subdir_count = subdir_count
+        self.total_size = total_size
+        self.reused_dirs = reused_dirs
+        self.tree = tree
+        self.total_usage = total_usage
+        self.dir_usage = dir_usage
+        self.types = types
+        self.approximate = approximate
+
+
+class _WorkQueue:
+    """
+    Directories waiting to be listed, shared by all walker threads.
+
+    Workers walk depth-first from a private stack and only hand directories back here
+    when another worker is idle, so a single huge subtree gets split across the pool
+    instead of pinning one thread. The walk is over once the queue is empty and no
+    worker is still holding work.
+
+    :meth:`pause` stops every worker at a directory boundary so the frontier (queued
+    items plus every parked worker's stack) can be checkpointed consistently.
+
+    Only workers whose rank is below :attr:`limit` take work; the adaptive controller
+    moves the limit with :meth:`set_limit` and workers above it hand their stacks back.
+
+    With a priority key, queued items are kept sorted so the highest key is handed out first.
+    """
+
+    def __init__(self, items, workers, key=None):
+        self._key = key
+        self._items = sorted(items, key=key) if key is not None else list(items)
+        self._cond = threading.Condition()
+        self._active = workers
+        self._waiting = 0
+        # Checked by workers between directories (unlocked reads)
+        self.pausing = False
+        self.limit = workers
+        self._parked = {}
+
+    def get(self, cancel_event=None, rank=0):
+        """Called by a worker whose stack ran dry; returns the next item, or None when the walk is over."""
+        with self._cond:
+            self._active -= 1
+            while not self._items or self.pausing or rank >= self.limit:
+                cancelled = cancel_event is not None and cancel_event.is_set()
+                if not self._items and (self._active == 0 or cancelled):
+                    self._cond.notify_all()
+                    return None
+                if cancelled and rank >= self.limit:
+                    # A throttled worker holds nothing, so it can simply leave
+                    return None
+                # Throttled workers are not hungry and poll less often
+                hungry = rank < self.limit
+                if hungry:
+                    self._waiting += 1
+                self._cond.wait(0.05 if hungry else 0.5)
+                if hungry:
+                    self._waiting -= 1
+            self._active += 1
+            return self._items.pop()
+
+    def set_limit(self, limit):
+        """Lets only the workers ranked below limit take work."""
+        with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+    def hungry(self):
+        """True when some worker is waiting for work (unlocked read, only used as a hint)."""
+        return self._waiting > 0 and not self._items
+
+    def share(self, items):
+        """Hands directories over to idle workers."""
+        with self._cond:
+            self._items.extend(items)
+            if self._key is not None:
+                self._items.sort(key=self._key)
+            self._cond.notify(len(items))
+
+    def retire(self, stack=()):
+        """Drops a worker that stopped early (cancellation or error), keeping its unvisited items."""
+        with self._cond:
+            self._items.extend(stack)
+            if self._key is not None:
+                self._items.sort(key=self._key)
+            self._active -= 1
+            self._cond.notify_all()
+
+    def park(self, stack):
+        """Called by a worker between directories while pausing; blocks until :meth:`resume`."""
+        with self._cond:
+            self._parked[id(stack)] = stack
+            self._cond.notify_all()
+            while self.pausing:
+                self._cond.wait()
+            del self._parked[id(stack)]
+
+    def pause(self):
+        """Waits until every busy worker is parked; returns the frontier (all unvisited items)."""
+        with self._cond:
+            self.pausing = True
+            while len(self._parked) < self._active:
+                self._cond.wait(0.05)
+            return list(self._items) + [item for stack in self._parked.values() for item in stack]
+
+    def resume(self):
+        with self._cond:
+            self.pausing = False
+            self._cond.notify_all()
+
+    def leftover(self):
+        """Items nobody visited (after a cancelled walk has finished)."""
+        with self._cond:
+            return list(self._items)
+
+
+class _DiskUsage:
+    """
+    Allocated-size accounting shared by all walkers of one scan.
+
+    Usage is st_blocks * 512 (st_size where the platform has no st_blocks). A file with
+    several hard links is only counted the first time one of its links is seen; the
+    (st_dev, st_ino) keys of such files are packed into single ints in one set.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seen_inodes = set()
+
+    def account(self, st):
+        """Returns the bytes st adds to disk usage (0 for an already counted hard link)."""
+        blocks = getattr(st, "st_blocks", None)
+        used = blocks * 512 if blocks is not None else st.st_size
+        if st.st_nlink > 1 and st.st_ino:
+            key = (st.st_dev << 64) | st.st_ino
+            with self.lock:
+                if key in self.seen_inodes:
+                    return 0
+                self.seen_inodes.add(key)
+        return used
+
+
+class _Walker:
+    """
+    Per-thread walk state: byte totals per top-level slot and the local top-N files.
+
+    One directory is handled per :meth:`visit` call; subclasses change how a directory
+    is read (e.g. from the scan index) without touching the threading in _parallel_walk.
+    """
+
+    def __init__(self, num_files, ids=None, usage=None, wstats=None, file_types=False, pruner=None,
+                 cancel_event=None):
+        self.sizes = {}
+        self.top = _TopFiles(num_files)
+        # Polled inside listings so a huge directory cannot delay cancellation; the part
+        # listed so far is kept (None => directories are always listed to the end)
+        self.cancel_event = cancel_event
+        # Optional bound ScanFilter: pruned directories are never queued, pruned files never counted
+        self.pruner = pruner
+        # Optional _WorkerStats; None keeps visit() free of timing calls
+        self.wstats = wstats
+        # Optional extension/size histogram of the files this walker stat'ed
+        self.types = FileTypeHistogram() if file_types else None
+        # Disk-usage mode: shared _DiskUsage plus per-slot allocated bytes
+        self.usage = usage
+        self.usage_sizes = {}
+        # Size-tree rows, one per directory visited (see SizeTree.from_rows). Ids come
+        # from a counter shared by all walkers, so a child's id is always above its parent's.
+        self.ids = ids if ids is not None else itertools.count(1)
+        self.node_ids = array("q")
+        self.parent_ids = array("q")
+        self.names = []
+        self.own = array("q")
+        self.own_used = array("q")
+
+    def add_node(self, node, parent, path, own, used=0):
+        """Records one directory row for the size tree."""
+        self.node_ids.append(node)
+        self.parent_ids.append(parent)
+        self.names.append(path.rpartition(os.sep)[2])
+        self.own.append(own)
+        self.own_used.append(used)
+
+    def rows(self):
+        return self.node_ids, self.parent_ids, self.names, self.own, self.own_used
+
+    def visit(self, path, slot, parent, stack):
+        """
+        Lists one directory, queueing its subdirectories on stack as (path, slot, node_id)
+        and recording its size-tree row; returns the bytes of the files directly in it.
+        """
+        if self.wstats is not None:
+            return self._visit_instrumented(path, slot, parent, stack)
+        node = next(self.ids)
+        top = self.top
+        usage = self.usage
+        types = self.types
+        pruner = self.pruner
+        cancel = self.cancel_event
+        dir_size = 0
+        dir_used = 0
+        try:
+            it = os.scandir(path)
+        except OSError:
+            self.add_node(node, parent, path, 0)
+            return 0
+        try:
+            with it:
+                for entry in it if cancel is None else _until_cancelled(it, cancel):
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if pruner is None or not pruner.skip_dir(entry):
+                                stack.append((entry.path, slot, node))
+                            continue
+                        # Skip symbolic links
+                        if entry.is_symlink():
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    size = st.st_size
+                    if pruner is not None and pruner.skip_file(entry, size):
+                        continue
+                    dir_size += size
+                    if usage is not None:
+                        dir_used += usage.account(st)
+                    if types is not None:
+                        types.add(entry.name, size)
+                    if size > top.threshold:
+                        top.push(size, entry.path)
+        except OSError:
+            # Listing failed part-way (e.g. EACCES on some /proc entries); keep what was read
+            pass
+        self.sizes[slot] = self.sizes.get(slot, 0) + dir_size
+        if usage is not None:
+            self.usage_sizes[slot] = self.usage_sizes.get(slot, 0) + dir_used
+        self.add_node(node, parent, path, dir_size, dir_used)
+        return dir_size
+
+    def _visit_instrumented(self, path, slot, parent, stack):
+        """visit() with counters and readdir/stat timings recorded in self.wstats."""
+        wstats = self.wstats
+        clock = time.perf_counter
+        node = next(self.ids)
+        top = self.top
+        usage = self.usage
+        types = self.types
+        pruner = self.pruner
+        cancel = self.cancel_event
+        dir_size = 0
+        dir_used = 0
+        stat_s = 0.0
+        files = 0
+        t0 = clock()
+        try:
+            it = os.scandir(path)
+        except OSError as e:
+            wstats.error(e)
+            wstats.readdir_s += clock() - t0
+            self.add_node(node, parent, path, 0)
+            return 0
+        try:
+            with it:
+                for entry in it if cancel is None else _until_cancelled(it, cancel):
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if pruner is None or not pruner.skip_dir(entry):
+                                stack.append((entry.path, slot, node))
+                            continue
+                        if entry.is_symlink():
+                            continue
+                        t1 = clock()
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                        finally:
+                            stat_s += clock() - t1
+                            wstats.stat_calls += 1
+                    except OSError as e:
+                        wstats.error(e)
+                        continue
+                    size = st.st_size
+                    if pruner is not None and pruner.skip_file(entry, size):
+                        continue
+                    files += 1
+                    dir_size += size
+                    if usage is not None:
+                        dir_used += usage.account(st)
+                    if types is not None:
+                        types.add(entry.name, size)
+                    if size > top.threshold:
+                        top.push(size, entry.path)
+        except OSError as e:
+            wstats.error(e)
+        # Everything that was not stat() is listing: opendir, getdents and the type checks
+        wstats.readdir_s += clock() - t0 - stat_s
+        wstats.stat_s += stat_s
+        wstats.dirs += 1
+        wstats.files += files
+        wstats.bytes += dir_size
+        self.sizes[slot] = self.sizes.get(slot, 0) + dir_size
+        if usage is not None:
+            self.usage_sizes[slot] = self.usage_sizes.get(slot, 0) + dir_used
+        self.add_node(node, parent, path, dir_size, dir_used)
+        return dir_size
+
+
+class _IndexedWalker(_Walker):
+    """
+    _Walker that reuses the scan index for directories whose mtime/ctime did not change.
+
+    Unchanged directories cost one stat: their subdirectory names and file total come
+    from the index, and their file list is only fetched when it could hold a top-N file.
+    Note that rewriting a file in place does not touch its directory's mtime, so such
+    size changes are only picked up once something else in that directory changes.
+    """
+
+    def __init__(self, num_files, index, cached, fresh_ns, ids=None, wstats=None, file_types=False,
+                 cancel_event=None):
+        super().__init__(num_files, ids, wstats=wstats, file_types=file_types, cancel_event=cancel_event)
+        self.index = index
+        self.cached = cached
+        # Directories modified after this instant may change again within the same
+        # timestamp tick, so they are stored as dirty and re-read next time.
+        self.fresh_ns = fresh_ns
+        self.seen = []
+        self.updates = []
+        self.reused = 0
+
+    def visit(self, path, slot, parent, stack):
+        node = next(self.ids)
+        wstats = self.wstats
+        try:
+            st = os.stat(path, follow_symlinks=False)
+        except OSError as e:
+            if wstats is not None:
+                wstats.error(e)
+            self.add_node(node, parent, path, 0)
+            return 0
+        self.seen.append(path)
+        if wstats is not None:
+            wstats.dirs += 1
+            wstats.stat_calls += 1
+
+        record = self.cached.get(path)
+        if record is not None and record[0] == st.st_mtime_ns and record[1] == st.st_ctime_ns:
+            _, _, file_bytes, largest, subdirs = record
+            self.reused += 1
+            if wstats is not None:
+                wstats.index_hits += 1
+                wstats.bytes += file_bytes
+            for name in subdirs:
+                stack.append((os.path.join(path, name), slot, node))
+            self.sizes[slot] = self.sizes.get(slot, 0) + file_bytes
+            self.add_node(node, parent, path, file_bytes)
+            top = self.top
+            types = self.types
+            if types is not None:
+                # The histogram needs every file: read the cached listing, not the disk
+                for name, size in self.index.files(path):
+                    types.add(name, size)
+                    if size > top.threshold:
+                        top.push(size, os.path.join(path, name))
+            elif largest > top.threshold:
+                for name, size in self.index.files(path):
+                    if size > top.threshold:
+                        top.push(size, os.path.join(path, name))
+            return file_bytes
+
+        # New or changed directory: list it and record the listing for next time
+        top = self.top
+        cancel = self.cancel_event
+        subdirs = []
+        names = []
+        sizes = array("q")
+        dir_size = 0
+        complete = True
+        try:
+            it = os.scandir(path)
+        except OSError as e:
+            if wstats is not None:
+                wstats.error(e)
+            self.add_node(node, parent, path, 0)
+            return 0
+        try:
+            with it:
+                for entry in it if cancel is None else _until_cancelled(it, cancel):
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                            stack.append((entry.path, slot, node))
+                            continue
+                        if entry.is_symlink():
+                            continue
+                        size = entry.stat(follow_symlinks=False).st_size
+                    except OSError as e:
+                        if wstats is not None:
+                            wstats.error(e)
+                        continue
+                    names.append(entry.name)
+                    sizes.append(size)
+                    dir_size += size
+                    if size > top.threshold:
+                        top.push(size, entry.path)
+        except OSError as e:
+            complete = False
+            if wstats is not None:
+                wstats.error(e)
+        if cancel is not None and cancel.is_set():
+            # The listing may have been cut short
+            complete = False
+        self.sizes[slot] = self.sizes.get(slot, 0) + dir_size
+        if self.types is not None:
+            for name, size in zip(names, sizes):
+                self.types.add(name, size)
+        if wstats is not None:
+            wstats.files += len(sizes)
+            wstats.stat_calls += len(sizes)
+            wstats.bytes += dir_size
+
+        # Partial listings are stored dirty too, so the next scan reads them again
+        mtime_ns = st.st_mtime_ns if complete and st.st_mtime_ns < self.fresh_ns else -1
+        largest = max(sizes) if sizes else -1
+        self.updates.append((path, mtime_ns, st.st_ctime_ns, dir_size, largest, subdirs, names, sizes))
+        self.add_node(node, parent, path, dir_size)
+        return dir_size
+
+
+class _SharedTopFiles(_TopFiles):
+    """_TopFiles shared by all walker threads of a reporting scan; remembers newly admitted files."""
+
+    __slots__ = ("lock", "entered")
+
+    def __init__(self, num):
+        super().__init__(num)
+        self.lock = threading.Lock()
+        self.entered = []
+
+    def push(self, size, path):
+        with self.lock:
+            # threshold was read without the lock; re-check now that we hold it
+            if size > self.threshold:
+                _TopFiles.push(self, size, path)
+                self.entered.append((path, size))
+
+
+class _ScanProgress:
+    """Shared running totals for a scan that reports :class:`ScanEvent` objects as it goes."""
+
+    def __init__(self, subdirs, num_files, on_event, interval):
+        self.lock = threading.Lock()
+        self.subdirs = subdirs
+        self.outstanding = [1] * len(subdirs)
+        self.slot_sizes = [0] * len(subdirs)
+        self.top = _SharedTopFiles(num_files)
+        self.total_size = 0
+        self.dirs_seen = 0
+        self.on_event = on_event
+        self.interval = interval
+        self.next_report = time.perf_counter() + interval
+
+    def restore(self, frontier, slot_sizes, dirs_seen):
+        """Takes over the totals of a resumed walk; subdirectories with nothing left to list are reported done."""
+        events = []
+        with self.lock:
+            self.outstanding = [0] * len(self.subdirs)
+            for _, slot, _ in frontier:
+                self.outstanding[slot] += 1
+            for slot, size in slot_sizes.items():
+                self.slot_sizes[slot] += size
+                self.total_size += size
+            self.dirs_seen += dirs_seen
+            for slot, left in enumerate(self.outstanding):
+                if left == 0:
+                    events.append(ScanEvent(ScanEvent.DIR_DONE, self.subdirs[slot], self.slot_sizes[slot]))
+        for event in events:
+            self.on_event(event)
+
+    def directory_done(self, slot, dir_size, new_dirs):
+        """Records one listed directory (new_dirs = subdirectories it queued) and emits events."""
+        events = []
+        with self.lock:
+            self.total_size += dir_size
+            self.dirs_seen += 1
+            if slot >= 0:
+                self.slot_sizes[slot] += dir_size
+                self.outstanding[slot] += new_dirs - 1
+                if self.outstanding[slot] == 0:
+                    events.append(ScanEvent(ScanEvent.DIR_DONE, self.subdirs[slot], self.slot_sizes[slot]))
+            events.extend(self._drain_locked())
+        for event in events:
+            self.on_event(event)
+
+    def report(self, force=False):
+        """Emits pending top-file and progress events (throttled to ``interval`` unless forced)."""
+        with self.lock:
+            events = self._drain_locked(force)
+        for event in events:
+            self.on_event(event)
+
+    def _drain_locked(self, force=False):
+        events = []
+        with self.top.lock:
+            entered, self.top.entered = self.top.entered, []
+        for path, size in entered:
+            events.append(ScanEvent(ScanEvent.TOP_FILE, path, size))
+        now = time.perf_counter()
+        if force or now >= self.next_report:
+            self.next_report = now + self.interval
+            events.append(ScanEvent(ScanEvent.PROGRESS, total_size=self.total_size, dirs_seen=self.dirs_seen))
+        return events
+
+
+class _ReportingWalker:
+    """Wraps a walker so every finished directory is reported to a _ScanProgress."""
+
+    def __init__(self, inner, progress):
+        inner.top = progress.top
+        self.inner = inner
+        self.progress = progress
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def visit(self, path, slot, parent, stack):
+        before = len(stack)
+        dir_size = self.inner.visit(path, slot, parent, stack)
+        self.progress.directory_done(slot, dir_size, len(stack) - before)
+        return dir_size
+
+
+def _walk_worker(queue, walker, cancel_event, rank=0, limiter=None, failures=None):
+    """
+    Worker loop for :func:`_parallel_walk`. rank orders the workers for the adaptive limit;
+    limiter (an IopsLimiter, needs walker.wstats) paces the directories visited. When
+    failures (a list) is given, an exception is appended to it and cancel_event is set to
+    stop the other workers, instead of being raised on this thread.
+    """
+    stack = []
+    wstats = walker.wstats
+    clock = time.perf_counter
+    try:
+        while True:
+            if stack and rank >= queue.limit:
+                # Over the adaptive limit: give the backlog to the remaining workers
+                queue.share(stack)
+                del stack[:]
+            if not stack:
+                if wstats is None:
+                    item = queue.get(cancel_event, rank)
+                else:
+                    t0 = clock()
+                    item = queue.get(cancel_event, rank)
+                    wstats.idle_s += clock() - t0
+                if item is None:
+                    break
+                stack.append(item)
+            if cancel_event is not None and cancel_event.is_set():
+                queue.retire(stack)
+                break
+            if queue.pausing:
+                queue.park(stack)
+
+            path, slot, parent = stack.pop()
+            if wstats is None:
+                walker.visit(path, slot, parent, stack)
+            elif limiter is None:
+                t0 = clock()
+                walker.visit(path, slot, parent, stack)
+                wstats.busy_s += clock() - t0
+            else:
+                t0 = clock()
+                limiter.wait(cancel_event)
+                t1 = clock()
+                ops = wstats.dirs + wstats.stat_calls
+                walker.visit(path, slot, parent, stack)
+                # At least the opendir, even when the listing failed
+                limiter.spend(max(1, wstats.dirs + wstats.stat_calls - ops))
+                wstats.idle_s += t1 - t0
+                wstats.busy_s += clock() - t1
+
+            # Give the shallowest half of our backlog (the biggest subtrees) to idle workers
+            if len(stack) > 1 and queue.hungry():
+                half = len(stack) // 2
+                queue.share(stack[:half])
+                del stack[:half]
+    except BaseException as e:
+        queue.retire(stack)
+        if failures is None:
+            raise
+        failures.append(e)
+        cancel_event.set()
+
+def _parallel_walk(subdirs, num_files, max_workers=None, cancel_event=None, make_walker=None, ids=None,
+                   items=None, prior=None, checkpoint=None, checkpoint_interval=60.0, throttle=None, priority=None):
+    """
+    Walks the given directories with a pool of threads sharing one work queue.
+
+    Args:
+        subdirs (list): Directory paths whose totals are wanted.
+        num_files (int): Number of largest files to collect (0 => none).
+        max_workers (int|None): Number of worker threads (None => automatic).
+        cancel_event (threading.Event|None): If set, stops walking early.
+        make_walker (callable|None): Builds one _Walker per thread (None => _Walker(num_files, ids)).
+        ids (iterator|None): Shared node-id counter; subdirs hang off node 0 (None => a fresh counter).
+        items (list|None): (path, slot, parent) work items to start from (None => one per subdir).
+        prior (_Walker|None): Totals and size-tree rows carried over from an earlier, interrupted walk.
+        checkpoint (callable|None): Called as checkpoint(frontier, walkers) with the pool paused
+            every checkpoint_interval seconds, and once more at the end if the walk was cancelled.
+        checkpoint_interval (float): Seconds between checkpoints.
+        throttle (ScanThrottle|None): Adaptive worker count and/or I/O-rate ceiling. The
+            walkers must carry _WorkerStats (their counters are what is measured); in adaptive
+            mode max_workers is the ceiling (None => ADAPTIVE_MAX_WORKERS).
+        priority (callable|None): Sort key for queued (path, slot, parent) items; the highest
+            is handed out first (None => most recently queued first).
+
+    Returns:
+        tuple: (sizes, top_files, walkers) where sizes[i] is the total for subdirs[i],
+        top_files is the merged _TopFiles selection and walkers holds the per-thread state
+        (prior included).
+
+    Raises:
+        Exception: The first error raised on a worker thread (e.g. by a walker or an on_event
+            callback), once every worker has stopped; the totals would be missing its work.
+    """
+    cpu = os.cpu_count() or 1
+    initial = min(32, cpu * 5)
+    controller = limiter = None
+    if throttle is not None:
+        from utils.throttle import ADAPTIVE_MAX_WORKERS, IopsLimiter, _Controller
+        if throttle.max_iops is not None:
+            limiter = IopsLimiter(throttle.max_iops)
+        if throttle.adaptive and max_workers is None:
+            max_workers = ADAPTIVE_MAX_WORKERS
+    if max_workers is None:
+        max_workers = initial
+    max_workers = max(1, max_workers)
+
+    if ids is None:
+        ids = itertools.count(1)
+    if make_walker is None:
+        make_walker = lambda: _Walker(num_files, ids)
+
+    if items is None:
+        items = [(p, i, 0) for i, p in enumerate(subdirs)]
+    queue = _WorkQueue(items, max_workers, priority)
+    walkers = [make_walker() for _ in range(max_workers)]
+    if throttle is not None and throttle.adaptive:
+        controller = _Controller(throttle, initial, max_workers)
+        queue.limit = controller.limit
+    # Workers stop on the caller's flag, or on their own when one of them fails
+    failures = []
+    stop = _Cancel([cancel_event])
+    threads = [threading.Thread(target=_walk_worker, args=(queue, w, stop, rank, limiter, failures), daemon=True)
+               for rank, w in enumerate(walkers)]
+    if prior is not None:
+        walkers.append(prior)
+    for t in threads:
+        t.start()
+    if checkpoint is None and controller is None:
+        for t in threads:
+            t.join()
+    else:
+        forever = float("inf")
+        due = time.monotonic() + checkpoint_interval if checkpoint is not None else forever
+        tune = time.monotonic() + throttle.interval if controller is not None else forever
+        wstats = [w.wstats for w in walkers[:max_workers]]
+        for t in threads:
+            while t.is_alive():
+                t.join(max(0.0, min(0.5, due - time.monotonic(), tune - time.monotonic())))
+                now = time.monotonic()
+                if now >= tune:
+                    ops = io_s = 0
+                    for w in wstats:
+                        ops += w.dirs + w.stat_calls
+                        io_s += w.readdir_s + w.stat_s
+                    queue.set_limit(controller.update(ops, io_s))
+                    tune = now + throttle.interval
+                if now >= due and t.is_alive() and not failures:
+                    # Workers park between directories, so the frontier and totals agree
+                    frontier = queue.pause()
+                    try:
+                        checkpoint(frontier, walkers)
+                    finally:
+                        queue.resume()
+                    due = time.monotonic() + checkpoint_interval
+        if checkpoint is not None and not failures and cancel_event is not None and cancel_event.is_set():
+            checkpoint(queue.leftover(), walkers)
+    if failures:
+        raise failures[0]
+
+    sizes = [0] * len(subdirs)
+    top_files = _TopFiles(num_files)
+    for walker in walkers:
+        for slot, size in walker.sizes.items():
+            sizes[slot] += size
+    # Reporting walkers all share one selection; merge each distinct one once
+    for top in {id(w.top): w.top for w in walkers}.values():
+        top_files.merge(top)
+    return sizes, top_files, walkers
+
+def _list_root(root_dir, top_files, pruner=None, cancel_event=None, root_stats=None, usage=None, types=None):
+    """
+    Lists root_dir's immediate entries: subdirectories (no symlinks) are returned, files are
+    counted here and offered to top_files, types and usage.
+
+    Args:
+        root_dir (str): Root directory of a scan.
+        top_files (_TopFiles): Receives the root's own files.
+        pruner (_Pruner|None): Bound ScanFilter.
+        cancel_event (threading.Event|None): Stops the listing early when set.
+        root_stats (_WorkerStats|None): Receives counts and errors.
+        usage (_DiskUsage|None): Allocated-size accounting (disk-usage scans).
+        types (FileTypeHistogram|None): Receives the root's own files.
+
+    Returns:
+        tuple: (subdirs, own_bytes, own_used) where own_used is 0 unless usage is given.
+
+    Raises:
+        OSError: root_dir cannot be listed.
+    """
+    subdirs = []
+    total_size = 0
+    total_used = 0
+    with os.scandir(root_dir) as it:
+        for entry in it if cancel_event is None else _until_cancelled(it, cancel_event):
             try:
-                size = os.path.getsize(fp)
-            except OSError:
+                if entry.is_dir(follow_symlinks=False):
+                    if pruner is None or not pruner.skip_dir(entry):
+                        subdirs.append(entry.path)
+                elif not entry.is_symlink():
+                    st = entry.stat(follow_symlinks=False)
+                    size = st.st_size
+                    if pruner is not None and pruner.skip_file(entry, size):
+                        continue
+                    total_size += size
+                    if usage is not None:
+                        total_used += usage.account(st)
+                    if types is not None:
+                        types.add(entry.name, size)
+                    if size > top_files.threshold:
+                        top_files.push(size, entry.path)
+                    if root_stats is not None:
+                        root_stats.files += 1
+                        root_stats.stat_calls += 1
+                        root_stats.bytes += size
+            except OSError as e:
+                if root_stats is not None:
+                    root_stats.error(e)
+    if root_stats is not None:
+        root_stats.dirs += 1
+    return subdirs, total_size, total_used
+
+def scan(root_dir, num_dirs=10, num_files=10, max_workers=None, cancel_event=None, index_path=None,
+         backend="threads", on_event=None, progress_interval=0.1, disk_usage=False, stats=None,
+         file_types=False, filters=None, checkpoint_path=None, checkpoint_interval=60.0, resume=False,
+         throttle=None, time_budget=None):
+    """
+    Walks root_dir once and returns both the largest immediate subdirectories and the largest files.
+
+    Every file is stat'ed a single time; its size is added to the total of the immediate
+    subdirectory it lives under and offered to the top-N file selection in the same step.
+
+    Args:
+        root_dir (str): The path to the root directory to scan.
+        num_dirs (int): The number of largest subdirectories to return.
+        num_files (int): The number of largest files to return.
+        max_workers (int|None): Number of worker threads (or processes) for parallel scanning (None => automatic).
+        cancel_event (threading.Event|None): If set, stops scanning early (within milliseconds,
+            also inside large directories); the partial result is returned with approximate=True.
+        index_path (str|None): SQLite scan index to read and update. Directories whose
+            mtime/ctime match the index are not re-read (None => full scan, no index).
+        backend (str): "threads" (default) or "processes". The process backend spreads the
+            per-file Python work over all cores; it does not support index_path or on_event.
+        on_event (callable|None): Called with a ScanEvent as results come in (from worker
+            threads, so it must be thread-safe and quick).
+        progress_interval (float): Minimum seconds between PROGRESS events.
+        disk_usage (bool): Also measure allocated size (st_blocks * 512, hard links counted
+            once) next to apparent size, from the same stat call. Rankings stay by apparent
+            size. Not supported with index_path or the process backend.
+        stats (ScanStats|None): Collects counts, errors and timings while the scan runs
+            (None => no instrumentation).
+        file_types (bool): Also count files and bytes per extension and per size bucket
+            (ScanResult.types), from the same walk. With index_path, unchanged directories
+            contribute their cached file listings.
+        filters (ScanFilter|None): Include/exclude globs, max depth, min file size and
+            one-filesystem pruning, applied before descending. Not supported with index_path.
+        checkpoint_path (str|None): Save the walk's frontier and partial totals here every
+            checkpoint_interval seconds and when the scan is cancelled; the file is removed
+            once the scan completes. Not supported with index_path, disk_usage or the
+            process backend.
+        checkpoint_interval (float): Seconds between checkpoints.
+        resume (bool): Continue from the checkpoint at checkpoint_path instead of starting
+            over (a fresh scan runs if there is none). Pass the same filters/file_types as before.
+        throttle (ScanThrottle|None): Adapt the number of active worker threads to measured
+            throughput/latency and/or cap filesystem operations per second. Not supported with
+            the process backend.
+        time_budget (float|None): Seconds the scan may take; when they run out it stops as
+            if cancelled and returns what it has, marked approximate (None => no limit).
+
+    Returns:
+        ScanResult: Largest directories and files, plus the subdirectory count and total size.
+    """
+    if backend not in ("threads", "processes"):
+        raise ValueError(f"Unknown scan backend: {backend!r}")
+    if backend == "processes" and (index_path is not None or on_event is not None):
+        raise ValueError("index_path and on_event are not supported with the process backend")
+    if disk_usage and (index_path is not None or backend == "processes"):
+        raise ValueError("disk_usage is not supported with index_path or the process backend")
+    if filters is not None and index_path is not None:
+        # Index records hold unfiltered directory listings
+        raise ValueError("filters are not supported with index_path")
+    if checkpoint_path is not None and (index_path is not None or disk_usage or backend == "processes"):
+        raise ValueError("checkpoint_path is not supported with index_path, disk_usage or the process backend")
+    if throttle is not None and backend == "processes":
+        raise ValueError("throttle is not supported with the process backend")
+    if not os.path.isdir(root_dir):
+        result = ScanResult(root_dir, [], [])
+        if on_event is not None:
+            on_event(ScanEvent(ScanEvent.DONE, root_dir, result=result))
+        return result
+    if time_budget is not None:
+        cancel_event = _Cancel([cancel_event], time.monotonic() + time_budget)
+    if index_path is not None or checkpoint_path is not None:
+        # Index keys and checkpoints are absolute so runs from different working directories agree
+        root_dir = os.path.abspath(root_dir)
+    state = None
+    # Everything a checkpoint's partial totals depend on besides the root
+    scan_options = (num_files, bool(file_types), filters.options() if filters is not None else None)
+    if checkpoint_path is not None and resume:
+        from utils.checkpoint import load_checkpoint
+        state = load_checkpoint(checkpoint_path)
+        if state is not None and state["root_dir"] != root_dir:
+            raise ValueError(f"{checkpoint_path} holds a checkpoint of {state['root_dir']!r}, not of {root_dir!r}")
+        if state is not None and state.get("options") != scan_options:
+            raise ValueError(f"{checkpoint_path} holds a checkpoint taken with other options "
+                             "(number of files, file types or filters)")
+
+    # Split immediate entries into subdirectories (skip symlinks) and files
+    clock = time.perf_counter
+    t0 = clock()
+    root_stats = stats.new_worker() if stats is not None else None
+    top_files = _TopFiles(num_files)
+    usage = _DiskUsage() if disk_usage else None
+    total_used = 0
+    types = FileTypeHistogram() if file_types else None
+    pruner = filters.bind(root_dir) if filters is not None else None
+    if state is not None:
+        # Resuming: the root was listed by the interrupted run
+        subdirs = state["subdirs"]
+        total_size = state["root_own"]
+        for size, path in state["top"]:
+            if size > top_files.threshold:
+                top_files.push(size, path)
+        if types is not None and state["types"] is not None:
+            types = state["types"]
+    else:
+        try:
+            subdirs, total_size, total_used = _list_root(root_dir, top_files, pruner, cancel_event, root_stats,
+                                                         usage, types)
+            if stats is not None:
+                stats.add_phase("root listing", clock() - t0)
+        except OSError as e:
+            if root_stats is not None:
+                root_stats.error(e)
+            result = ScanResult(root_dir, [], [])
+            if on_event is not None:
+                on_event(ScanEvent(ScanEvent.DONE, root_dir, result=result))
+            return result
+
+    # Re-checked as soon as the walk returns: set means something was left unvisited
+    # (checking later could count a deadline that passed after a complete walk)
+    approximate = cancel_event is not None and cancel_event.is_set()
+    progress = None
+    if on_event is not None:
+        progress = _ScanProgress(subdirs, num_files, on_event, progress_interval)
+        progress.top.merge(top_files)
+        top_files = progress.top
+        if state is not None:
+            progress.restore(state["frontier"], state["sizes"], state["dirs_done"])
+        progress.directory_done(-1, total_size, 0)
+
+    dir_sizes = {}
+    reused_dirs = 0
+    root_own = total_size
+    root_used = total_used
+    dir_usage = {}
+    rows = []
+    if subdirs and backend == "processes":
+        t0 = clock()
+        sizes, files, rows, shard_types = _process_walk(subdirs, num_files, max_workers, cancel_event, stats,
+                                                        file_types, pruner)
+        approximate = cancel_event is not None and cancel_event.is_set()
+        if types is not None:
+            types.merge(shard_types)
+        if stats is not None:
+            stats.add_phase("walk", clock() - t0)
+        dir_sizes = dict(zip(subdirs, sizes))
+        total_size += sum(sizes)
+        top_files.merge(files)
+    elif subdirs:
+        index = None
+        ids = itertools.count(1 if state is None else state["next_id"])
+        items = prior = checkpoint = None
+        if state is not None:
+            # Totals and size-tree rows of everything the interrupted run listed
+            prior = _Walker(0)
+            prior.sizes = dict(state["sizes"])
+            prior.node_ids, prior.parent_ids, prior.names, prior.own, prior.own_used = state["rows"]
+            items = state["frontier"]
+        if checkpoint_path is not None:
+            from utils.checkpoint import save_checkpoint
+            root_top = top_files
+            root_types = types
+
+            def checkpoint(frontier, walkers):
+                t0 = clock()
+                top = _TopFiles(num_files)
+                for t in {id(x): x for x in [root_top] + [w.top for w in walkers]}.values():
+                    top.merge(t)
+                sizes = {}
+                rows = (array("q"), array("q"), [], array("q"), array("q"))
+                hist = None
+                if root_types is not None:
+                    hist = FileTypeHistogram()
+                    hist.merge(root_types)
+                for w in walkers:
+                    for slot, size in w.sizes.items():
+                        sizes[slot] = sizes.get(slot, 0) + size
+                    for column, part in zip(rows, w.rows()):
+                        column.extend(part)
+                    if hist is not None and w.types is not None:
+                        hist.merge(w.types)
+                save_checkpoint(checkpoint_path, dict(
+                    root_dir=root_dir, options=scan_options, subdirs=subdirs, root_own=root_own,
+                    next_id=next(ids), frontier=frontier,
+                    sizes=sizes, top=top.heap, rows=rows, types=hist, dirs_done=len(rows[0])))
+                if stats is not None:
+                    stats.add_phase("checkpoint", clock() - t0)
+        if index_path is not None:
+            from utils.index import ScanIndex
+            t0 = clock()
+            index = ScanIndex(index_path)
+            cached = index.load(root_dir)
+            fresh_ns = time.time_ns() - 2 * 10**9
+            if stats is not None:
+                stats.add_phase("index load", clock() - t0)
+
+        # A directory cut short mid-listing would be missing from a checkpoint's frontier,
+        # so checkpointed scans only stop between directories
+        walker_cancel = cancel_event if checkpoint_path is None else None
+
+        def make_walker():
+            wstats = _worker_stats(stats, throttle)
+            if index is not None:
+                walker = _IndexedWalker(num_files, index, cached, fresh_ns, ids, wstats, file_types, walker_cancel)
+            else:
+                walker = _Walker(num_files, ids, usage, wstats, file_types, pruner, walker_cancel)
+            if progress is not None:
+                walker = _ReportingWalker(walker, progress)
+            return walker
+
+        try:
+            t0 = clock()
+            sizes, files, walkers = _parallel_walk(subdirs, num_files, max_workers, cancel_event, make_walker, ids,
+                                                   items, prior, checkpoint, checkpoint_interval, throttle)
+            approximate = cancel_event is not None and cancel_event.is_set()
+            if stats is not None:
+                stats.add_phase("walk", clock() - t0)
+            rows = [w.rows() for w in walkers]
+            if types is not None:
+                for w in walkers:
+                    if w.types is not None:
+                        types.merge(w.types)
+            if usage is not None:
+                for w in walkers:
+                    for slot, used in w.usage_sizes.items():
+                        dir_usage[subdirs[slot]] = dir_usage.get(subdirs[slot], 0) + used
+                total_used += sum(dir_usage.values())
+            if index is not None:
+                t0 = clock()
+                index.update([u for w in walkers for u in w.updates])
+                if not approximate:
+                    seen = set()
+                    for w in walkers:
+                        seen.update(w.seen)
+                    index.remove([p for p in cached if p not in seen and p != root_dir])
+                reused_dirs = sum(w.reused for w in walkers)
+                if stats is not None:
+                    stats.add_phase("index save", clock() - t0)
+        finally:
+            if index is not None:
+                index.close()
+
+        dir_sizes = dict(zip(subdirs, sizes))
+        total_size += sum(sizes)
+        if progress is None:
+            # (reporting walkers already pushed straight into top_files)
+            top_files.merge(files)
+
+    if checkpoint_path is not None and not approximate:
+        from utils.checkpoint import remove_checkpoint
+        remove_checkpoint(checkpoint_path)
+
+    sorted_dirs = sorted(dir_sizes.items(), key=lambda item: item[1], reverse=True)
+    t0 = clock()
+    tree = SizeTree.from_rows(root_dir, root_own, rows, root_used if usage is not None else None)
+    if stats is not None:
+        stats.add_phase("tree build", clock() - t0)
+    result = ScanResult(
+        root_dir,
+        sorted_dirs[:num_dirs],
+        top_files.items(),
+        subdir_count=len(subdirs),
+        total_size=total_size,
+        reused_dirs=reused_dirs,
+        tree=tree,
+        total_usage=total_used if usage is not None else None,
+        dir_usage=dir_usage if usage is not None else None,
+        types=types,
+        approximate=approximate,
+    )
+    if progress is not None:
+        progress.report(force=True)
+        on_event(ScanEvent(ScanEvent.DONE, root_dir, total_size, total_size, progress.dirs_seen, result))
+    return result
+
+class _RootsWalker:
+    """
+    Per-thread walker for :func:`scan_roots`: one inner _Walker per root (created on first
+    use), picked by the item's slot, so each root keeps its own totals, top files and tree.
+    """
+
+    def __init__(self, batch, wstats):
+        self.batch = batch
+        self.wstats = wstats
+        self.inner = {}
+        # Read by _parallel_walk's final merge; the batch assembles per-root results itself
+        self.sizes = {}
+        self.top = _TopFiles(0)
+
+    def walker(self, root):
+        walker = self.inner.get(root)
+        if walker is None:
+            batch = self.batch
+            walker = self.inner[root] = _Walker(batch.num_files, batch.ids, wstats=self.wstats,
+                                                file_types=batch.file_types, pruner=batch.pruners[root],
+                                                cancel_event=batch.cancel_event)
+        return walker
+
+    def visit(self, path, slot, parent, stack):
+        batch = self.batch
+        before = len(stack)
+        dir_size = self.walker(batch.slot_root[slot]).visit(path, slot, parent, stack)
+        # A cancel or deadline may have cut this listing short
+        cut = batch.cancel_event is not None and batch.cancel_event.is_set()
+        batch.directory_done(slot, len(stack) - before, cut)
+        return dir_size
+
+
+class _Batch:
+    """Shared state of one :func:`scan_roots` call: slot ownership, completion counts and per-root results."""
+
+    def __init__(self, num_dirs, num_files, file_types, cancel_event, on_result):
+        self.num_dirs = num_dirs
+        self.num_files = num_files
+        self.file_types = file_types
+        self.cancel_event = cancel_event
+        self.on_result = on_result
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.walkers = []
+        # Per root: root_dir, subdirs, first slot, own bytes, top files, histogram, pruner
+        self.roots = []
+        self.pruners = []
+        self.results = []
+        self.root_pending = []
+        # Per root: some listing was cut short, so its result is only a lower bound
+        self.root_cut = []
+        # Per slot: owning root and directories queued or being listed
+        self.slot_root = []
+        self.slot_pending = []
+
+    def add_root(self, root_dir, subdirs, own, top, types, pruner):
+        index = len(self.roots)
+        self.roots.append((root_dir, subdirs, len(self.slot_root), own, top, types))
+        self.pruners.append(pruner)
+        self.results.append(None)
+        self.root_pending.append(len(subdirs))
+        self.root_cut.append(False)
+        self.slot_root.extend([index] * len(subdirs))
+        self.slot_pending.extend([1] * len(subdirs))
+        return index
+
+    def directory_done(self, slot, new_dirs, cut=False):
+        """
+        Counts one finished directory; the last one of a root's last slot finishes the root
+        (as approximate if any of its listings was cut short).
+        """
+        with self.lock:
+            root = self.slot_root[slot]
+            if cut:
+                self.root_cut[root] = True
+            self.slot_pending[slot] += new_dirs - 1
+            if self.slot_pending[slot]:
+                return
+            self.root_pending[root] -= 1
+            if self.root_pending[root]:
+                return
+        self.finish(root, approximate=self.root_cut[root])
+
+    def finish(self, root, approximate=False):
+        """Builds root's ScanResult from every thread's share of it and reports it."""
+        root_dir, subdirs, first_slot, own, top, types = self.roots[root]
+        sizes = [0] * len(subdirs)
+        rows = []
+        top_files = _TopFiles(self.num_files)
+        top_files.merge(top)
+        hist = None
+        if types is not None:
+            hist = FileTypeHistogram()
+            hist.merge(types)
+        for w in self.walkers:
+            walker = w.inner.get(root)
+            if walker is None:
                 continue
-            files.append((size, fp))
+            for slot, size in walker.sizes.items():
+                sizes[slot - first_slot] += size
+            top_files.merge(walker.top)
+            rows.append(walker.rows())
+            if hist is not None:
+                hist.merge(walker.types)
+        dirs = sorted(zip(subdirs, sizes), key=lambda item: item[1], reverse=True)
+        result = ScanResult(root_dir, dirs[:self.num_dirs], top_files.items(), subdir_count=len(subdirs),
+                            total_size=own + sum(sizes), tree=SizeTree.from_rows(root_dir, own, rows), types=hist,
+                            approximate=approximate)
+        self.results[root] = result
+        if self.on_result is not None:
+            self.on_result(root, result)
+
+def scan_roots(roots, num_dirs=10, num_files=10, max_workers=None, cancel_event=None, priorities=None,
+               on_result=None, stats=None, file_types=False, filters=None, throttle=None, time_budget=None):
+    """
+    Scans several root directories on one shared, bounded pool of worker threads.
+
+    Every root's immediate subdirectories become work items of a single walk, so the
+    pool stays busy across roots instead of each root running its own pool. Queued work
+    of higher-priority roots is handed out first. Each root's ScanResult is reported
+    through on_result as soon as its last directory has been listed.
+
+    Args:
+        roots (list): Root directory paths.
+        num_dirs (int): The number of largest subdirectories to return per root.
+        num_files (int): The number of largest files to return per root.
+        max_workers (int|None): Number of worker threads shared by all roots (None => automatic).
+        cancel_event (threading.Event|None): If set, stops scanning early; unfinished roots
+            are reported with approximate=True.
+        priorities (list|None): One number per root; higher goes first (None => list order).
+        on_result (callable|None): Called as on_result(index, result) when a root is done
+            (from a worker thread, so it must be thread-safe).
+        stats (ScanStats|None): Collects counts, errors and timings over all roots.
+        file_types (bool): Also build a FileTypeHistogram per root.
+        filters (ScanFilter|None): Applied to every root.
+        throttle (ScanThrottle|None): Adaptive worker count and/or I/O-rate ceiling for the pool.
+        time_budget (float|None): Seconds the whole batch may take (None => no limit).
+
+    Returns:
+        list: One ScanResult per root, in the order of roots (roots that are not directories
+        get an empty result).
+    """
+    if priorities is not None and len(priorities) != len(roots):
+        raise ValueError("priorities must have one entry per root")
+    if time_budget is not None:
+        cancel_event = _Cancel([cancel_event], time.monotonic() + time_budget)
+    batch = _Batch(num_dirs, num_files, file_types, cancel_event, on_result)
+    empty = []
+    root_stats = stats.new_worker() if stats is not None else None
+    t0 = time.perf_counter()
+    for root_dir in roots:
+        subdirs = []
+        own = 0
+        top = _TopFiles(num_files)
+        types = FileTypeHistogram() if file_types else None
+        pruner = None
+        # Roots not (fully) listed before a cancel or the deadline are finished as approximate below
+        cut = cancel_event is not None and cancel_event.is_set()
+        if not cut:
+            try:
+                pruner = filters.bind(root_dir) if filters is not None else None
+                subdirs, own, _ = _list_root(root_dir, top, pruner, cancel_event, root_stats, types=types)
+            except OSError as e:
+                # Missing or unreadable root: reported with an empty result
+                if root_stats is not None:
+                    root_stats.error(e)
+            cut = cancel_event is not None and cancel_event.is_set()
+        index = batch.add_root(root_dir, subdirs, own, top, types, pruner)
+        batch.root_cut[index] = cut
+        if not subdirs and not cut:
+            empty.append(index)
+    if stats is not None:
+        stats.add_phase("root listing", time.perf_counter() - t0)
+    for index in empty:
+        batch.finish(index)
+
+    if batch.slot_root:
+        if priorities is None:
+            priorities = [0] * len(roots)
+        # Highest priority first, then earlier roots; queues are popped from the end
+        slot_key = [(priorities[root], -root) for root in batch.slot_root]
+
+        def make_walker():
+            walker = _RootsWalker(batch, _worker_stats(stats, throttle))
+            batch.walkers.append(walker)
+            return walker
+
+        t0 = time.perf_counter()
+        _parallel_walk(batch.slot_root, num_files, max_workers, cancel_event, make_walker, batch.ids,
+                       [(p, slot, 0) for slot, p in enumerate(p for r in batch.roots for p in r[1])],
+                       throttle=throttle, priority=lambda item: slot_key[item[1]])
+        if stats is not None:
+            stats.add_phase("walk", time.perf_counter() - t0)
+    for index, result in enumerate(batch.results):
+        if result is None:
+            # Cancelled or out of time before this root was finished
+            batch.finish(index, approximate=True)
+    return batch.results
+
+class _Cancel:
+    """
+    Stop flag for one scan with the threading.Event methods the walkers use.
+
+    It is set by :meth:`set`, by any of the linked events or once the deadline (a
+    time.monotonic() value) has passed. Everything is checked when :meth:`is_set` is
+    polled, so linking needs no watcher thread and a deadline no timer.
+    """
+
+    __slots__ = ("sources", "deadline", "expired", "_flag")
+
+    def __init__(self, sources=(), deadline=None):
+        self.sources = [e for e in sources if e is not None]
+        self.deadline = deadline
+        # True when the deadline (not an event) stopped the scan
+        self.expired = False
+        self._flag = False
+
+    def set(self):
+        self._flag = True
 
-    if not files:
+    def is_set(self):
+        if self._flag:
+            return True
+        for source in self.sources:
+            if source.is_set():
+                self._flag = True
+                return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.expired = self._flag = True
+        return self._flag
+
+    def wait(self, timeout=None):
+        end = None if timeout is None else time.monotonic() + timeout
+        while not self.is_set():
+            if end is not None and time.monotonic() >= end:
+                return False
+            time.sleep(0.005)
+        return True
+
+def estimate_largest_directories(root_dir, num_largest=10, time_budget=5.0, rel_error=0.05, max_workers=None,
+                                 cancel_event=None, filters=None, on_update=None, update_interval=0.5, seed=None):
+    """
+    Estimates the sizes of root_dir's immediate subdirectories by sampling random paths
+    instead of walking every directory (see utils.estimate.SizeEstimator).
+
+    Sampling keeps going until every estimate is within rel_error (95% confidence), the
+    time budget runs out or cancel_event is set. Listings are reused and finished subtrees
+    count exactly, so a longer budget refines the estimates all the way to an exact scan
+    (time_budget=None, rel_error=0).
+
+    Args:
+        root_dir (str): The path to the root directory to estimate.
+        num_largest (int): The number of largest directories to return.
+        time_budget (float|None): Seconds to sample for at most (None => no limit).
+        rel_error (float): Target half-width of each confidence interval, relative to the
+            estimate (directories too small to matter for the ranking are not refined).
+        max_workers (int|None): Number of probing threads (None => automatic).
+        cancel_event (threading.Event|None): If set, stops sampling early.
+        filters (ScanFilter|None): Prunes directories and files while sampling.
+        on_update (callable|None): Called every update_interval seconds (and at the end)
+            with the current list of rows, for progressive display.
+        update_interval (float): Seconds between on_update calls.
+        seed (int|None): Seed for reproducible sampling.
+
+    Returns:
+        list: (directory_path, estimated_bytes, low, high) tuples, largest estimate first;
+        low and high bound the 95% confidence interval and are equal for exact sizes.
+    """
+    from utils.estimate import SizeEstimator
+
+    if not os.path.isdir(root_dir):
+        return []
+    pruner = filters.bind(root_dir) if filters is not None else None
+    try:
+        subdirs = _list_subdirs(root_dir, pruner)
+    except OSError:
         return []
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) * 5)
+    max_workers = max(1, min(max_workers, len(subdirs) * 4 or 1))
+
+    estimator = SizeEstimator(subdirs, pruner, seed)
+    stop = _Cancel([cancel_event], None if time_budget is None else time.monotonic() + time_budget)
+    threads = [threading.Thread(target=estimator.run_worker, args=(rank, stop), daemon=True)
+               for rank in range(max_workers)]
+    for t in threads:
+        t.start()
+    next_update = time.monotonic() + update_interval
+    while any(t.is_alive() for t in threads):
+        if threads[0].is_alive():
+            threads[0].join(0.05)
+        else:
+            time.sleep(0.05)
+        if estimator.precise_enough(rel_error):
+            stop.set()
+        if on_update is not None and time.monotonic() >= next_update:
+            on_update(sorted(estimator.results(), key=lambda r: r[1], reverse=True)[:num_largest])
+            next_update = time.monotonic() + update_interval
+    rows = sorted(estimator.results(), key=lambda r: r[1], reverse=True)[:num_largest]
+    if on_update is not None:
+        on_update(rows)
+    return rows
+
+def iter_scan(root_dir, num_dirs=10, num_files=10, cancel_event=None, **kwargs):
+    """
+    Runs :func:`scan` on a background thread and yields ScanEvent objects as they arrive.
+
+    The last event has kind ScanEvent.DONE and carries the final ScanResult. Closing the
+    generator early (e.g. breaking out of the loop) cancels the scan.
 
-    top = heapq.nlargest(num_files, files, key=lambda x: x[0])
-    # convert to (path, size)
-    return [(p, s) for s, p in top]
+    Args:
+        root_dir (str): The path to the root directory to scan.
+        num_dirs (int): The number of largest subdirectories to return.
+        num_files (int): The number of largest files to return.
+        cancel_event (threading.Event|None): If set, stops scanning early.
+        **kwargs: Passed through to :func:`scan` (max_workers, index_path, progress_interval,
+            disk_usage, stats, file_types, filters, checkpoint_path, checkpoint_interval, resume,
+            throttle).
+
+    Yields:
+        ScanEvent: Incremental updates, ending with a DONE event.
+    """
+    import queue
+
+    events = queue.SimpleQueue()
+    # Either the caller's event or closing this generator stops the scan
+    stop = _Cancel([cancel_event])
+
+    def run():
+        try:
+            scan(root_dir, num_dirs, num_files, cancel_event=stop, on_event=events.put, **kwargs)
+        except BaseException as e:
+            # Raised again by the consumer; re-raising here would only print it a second time
+            events.put(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    try:
+        while True:
+            event = events.get()
+            if isinstance(event, BaseException):
+                raise event
+            yield event
+            if event.kind == ScanEvent.DONE:
+                return
+    finally:
+        stop.set()
+
+async def ascan(root_dir, num_dirs=10, num_files=10, cancel_event=None, **kwargs):
+    """
+    Async generator version of :func:`iter_scan` for asyncio consumers.
+
+    The scan itself runs on worker threads; events are handed to the event loop as
+    they arrive, so the loop is never blocked.
+
+    Yields:
+        ScanEvent: Incremental updates, ending with a DONE event.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    stop = _Cancel([cancel_event])
+
+    def pump():
+        try:
+            for event in iter_scan(root_dir, num_dirs, num_files, cancel_event=stop, **kwargs):
+                loop.call_soon_threadsafe(events.put_nowait, event)
+        except BaseException as e:
+            loop.call_soon_threadsafe(events.put_nowait, e)
+
+    threading.Thread(target=pump, daemon=True).start()
+    try:
+        while True:
+            event = await events.get()
+            if isinstance(event, BaseException):
+                raise event
+            yield event
+            if event.kind == ScanEvent.DONE:
+                return
+    finally:
+        stop.set()
 
 def format_size(size_in_bytes):
     """Formats a size in bytes into a human-readable string (KB, MB, GB)."""
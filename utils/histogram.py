@@ -0,0 +1,68 @@
+"""
+File type and file size histograms.
+Counts and bytes per lower-cased extension and per power-of-4 size bucket,
+filled in by the scan walkers as they stat each file (no extra pass).
+"""
+
+from array import array
+
+# Bucket 0 holds empty files; bucket k >= 1 holds sizes in [4**(k-1), 4**k)
+NUM_BUCKETS = 33
+
+
+def bucket_bounds(bucket):
+    """Return the (low, high) byte range of a size bucket, high exclusive."""
+    if bucket == 0:
+        return 0, 1
+    return 4 ** (bucket - 1), 4 ** bucket
+
+
+class FileTypeHistogram:
+    """Per-extension and per-size-bucket (count, bytes) totals for the files of one scan."""
+
+    __slots__ = ("by_ext", "bucket_counts", "bucket_bytes")
+
+    def __init__(self):
+        # ext -> [count, bytes]
+        self.by_ext = {}
+        self.bucket_counts = array("q", bytes(8 * NUM_BUCKETS))
+        self.bucket_bytes = array("q", bytes(8 * NUM_BUCKETS))
+
+    def add(self, name, size):
+        """Counts one file; the extension is lower-cased and dotfiles count as having none."""
+        dot = name.rfind(".")
+        ext = name[dot:].lower() if dot > 0 else ""
+        totals = self.by_ext.get(ext)
+        if totals is None:
+            self.by_ext[ext] = [1, size]
+        else:
+            totals[0] += 1
+            totals[1] += size
+        bucket = (size.bit_length() + 1) >> 1
+        self.bucket_counts[bucket] += 1
+        self.bucket_bytes[bucket] += size
+
+    def merge(self, other):
+        """Adds other's totals into this histogram."""
+        if other is self:
+            return
+        for ext, (count, size) in other.by_ext.items():
+            totals = self.by_ext.get(ext)
+            if totals is None:
+                self.by_ext[ext] = [count, size]
+            else:
+                totals[0] += count
+                totals[1] += size
+        for i in range(NUM_BUCKETS):
+            self.bucket_counts[i] += other.bucket_counts[i]
+            self.bucket_bytes[i] += other.bucket_bytes[i]
+
+    def extensions(self, num=None):
+        """Return (extension, count, bytes) tuples, largest byte total first."""
+        rows = sorted(((ext, c, b) for ext, (c, b) in self.by_ext.items()), key=lambda r: r[2], reverse=True)
+        return rows[:num] if num is not None else rows
+
+    def size_buckets(self):
+        """Return (low, high, count, bytes) for every non-empty size bucket, smallest first."""
+        return [bucket_bounds(i) + (self.bucket_counts[i], self.bucket_bytes[i])
+                for i in range(NUM_BUCKETS) if self.bucket_counts[i]]
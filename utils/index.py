@@ -0,0 +1,115 @@
+"""
+Persistent scan index backed by SQLite.
+Stores one row per directory (mtime/ctime, file total, subdirectory names and
+packed file sizes) so repeat scans only re-read directories that changed.
+"""
+
+import os
+import sqlite3
+import threading
+from array import array
+
+# Default index location used by the GUI and CLI when no path is given
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".sizefinder-index.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path BLOB PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    ctime_ns INTEGER NOT NULL,
+    file_bytes INTEGER NOT NULL,
+    largest INTEGER NOT NULL,
+    subdirs BLOB NOT NULL,
+    names BLOB NOT NULL,
+    sizes BLOB NOT NULL
+)
+"""
+
+
+def _join_names(names):
+    return b"\0".join(os.fsencode(n) for n in names)
+
+
+def _split_names(blob):
+    return [os.fsdecode(n) for n in blob.split(b"\0")] if blob else []
+
+
+class ScanIndex:
+    """SQLite-backed cache of per-directory listings, keyed on directory path."""
+
+    def __init__(self, db_path=DEFAULT_INDEX_PATH):
+        """
+        Open (or create) the index.
+
+        Args:
+            db_path (str): Path of the SQLite database file.
+        """
+        self.db_path = db_path
+        # Walker threads read file listings through the same connection
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(_SCHEMA)
+            self._conn.commit()
+
+    def load(self, root_dir):
+        """
+        Load cached metadata for root_dir and everything below it.
+
+        Returns:
+            dict: path -> (mtime_ns, ctime_ns, file_bytes, largest_file, subdir_names).
+                  File names/sizes are not loaded here; see :meth:`files`.
+        """
+        key = os.fsencode(root_dir)
+        prefix = key if key.endswith(os.sep.encode()) else key + os.sep.encode()
+        upper = prefix[:-1] + bytes([prefix[-1] + 1])
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, mtime_ns, ctime_ns, file_bytes, largest, subdirs FROM dirs "
+                "WHERE path = ? OR (path >= ? AND path < ?)",
+                (key, prefix, upper),
+            ).fetchall()
+        return {
+            os.fsdecode(path): (mtime_ns, ctime_ns, file_bytes, largest, _split_names(subdirs))
+            for path, mtime_ns, ctime_ns, file_bytes, largest, subdirs in rows
+        }
+
+    def files(self, path):
+        """Return the cached (file_name, size_in_bytes) list of one directory."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT names, sizes FROM dirs WHERE path = ?", (os.fsencode(path),)
+            ).fetchone()
+        if row is None:
+            return []
+        sizes = array("q")
+        sizes.frombytes(row[1])
+        return list(zip(_split_names(row[0]), sizes))
+
+    def update(self, records):
+        """
+        Store fresh directory listings.
+
+        Args:
+            records (list): (path, mtime_ns, ctime_ns, file_bytes, largest, subdir_names,
+                             file_names, sizes_array) tuples.
+        """
+        rows = [
+            (os.fsencode(path), mtime_ns, ctime_ns, file_bytes, largest,
+             _join_names(subdirs), _join_names(names), sizes.tobytes())
+            for path, mtime_ns, ctime_ns, file_bytes, largest, subdirs, names, sizes in records
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def remove(self, paths):
+        """Forget directories that no longer exist."""
+        with self._lock:
+            self._conn.executemany("DELETE FROM dirs WHERE path = ?", [(os.fsencode(p),) for p in paths])
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
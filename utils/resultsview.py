@@ -0,0 +1,386 @@
+"""
+Virtualized results table for the CustomTkinter GUI.
+Result rows live in flat tables (array('q') sizes, a list of paths); sorting and
+filtering only rebuild an index array of the rows in display order, and the
+canvas draws just the rows that fit on screen, reusing the same canvas items.
+"""
+
+import tkinter as tk
+import tkinter.font
+from array import array
+
+from utils.finder import format_size
+
+KIND_FOLDER = 0
+KIND_FILE = 1
+_KIND_NAMES = ("Folder", "File")
+
+# Direction of the first click on each column: sizes read best largest first
+_DEFAULT_ASCENDING = {"kind": True, "size": False, "used": False, "path": True}
+
+# Light theme; pass palette= to ResultsTable for dark mode
+LIGHT_PALETTE = {"bg": "#ffffff", "stripe": "#f3f5f8", "fg": "#1a1a1a", "header_bg": "#e4e8ee",
+                 "header_fg": "#1a1a1a", "select_bg": "#3b8ed0", "select_fg": "#ffffff"}
+DARK_PALETTE = {"bg": "#2b2b2b", "stripe": "#323232", "fg": "#dce4ee", "header_bg": "#3a3a3a",
+                "header_fg": "#dce4ee", "select_bg": "#1f6aa5", "select_fg": "#ffffff"}
+
+
+class ResultsModel:
+    """Backing tables plus the sorted, filtered display order (no widgets involved)."""
+
+    def __init__(self):
+        self.paths = []
+        self.kinds = array("b")
+        self.sizes = array("q")
+        # On-disk sizes (-1 where unknown), or None when no row has one
+        self.used = None
+        # Row ids in display order
+        self.order = array("l")
+        self.sort_key = "size"
+        self.ascending = False
+        self.needle = ""
+        # Lower-cased paths, built by the first filter
+        self._folded = None
+        # All row ids sorted by the current key, so typing a filter never re-sorts
+        self._sorted = None
+
+    def set_rows(self, dirs, files=(), dir_usage=None):
+        """
+        Replace the rows, keeping the current sort order and filter.
+
+        Args:
+            dirs (list): (path, size) pairs shown as folders.
+            files (list): (path, size) pairs shown as files.
+            dir_usage (dict|None): Folder path -> bytes on disk (disk-usage scans).
+        """
+        self.paths = [p for p, _ in dirs]
+        self.paths.extend(p for p, _ in files)
+        self.kinds = array("b", bytes(len(dirs)))
+        self.kinds.extend(array("b", [KIND_FILE]) * len(files))
+        self.sizes = array("q", [s for _, s in dirs])
+        self.sizes.extend(s for _, s in files)
+        if dir_usage is not None:
+            self.used = array("q", [dir_usage.get(p, -1) for p, _ in dirs])
+            self.used.extend(array("q", [-1]) * len(files))
+        else:
+            self.used = None
+        self._folded = None
+        self._sorted = None
+        self._apply()
+
+    def __len__(self):
+        return len(self.order)
+
+    @property
+    def total_rows(self):
+        return len(self.paths)
+
+    def row(self, position):
+        """Returns (row_id, kind, path, size, used) of the row shown at position (used is -1 if unknown)."""
+        i = self.order[position]
+        return i, self.kinds[i], self.paths[i], self.sizes[i], self.used[i] if self.used is not None else -1
+
+    def position(self, row_id):
+        """Display position of row_id, or None when the filter hides it."""
+        try:
+            return self.order.index(row_id)
+        except ValueError:
+            return None
+
+    def sort(self, key, ascending=None):
+        """Sort by key ('kind', 'size', 'used' or 'path'); by default a repeated key flips the direction."""
+        if ascending is None:
+            ascending = not self.ascending if key == self.sort_key else _DEFAULT_ASCENDING[key]
+        self.sort_key = key
+        self.ascending = ascending
+        self._sorted = None
+        self._apply()
+
+    def set_filter(self, text):
+        """Show only rows whose path contains text (case-insensitive; empty shows all)."""
+        needle = text.strip().lower()
+        if needle != self.needle:
+            self.needle = needle
+            self._apply()
+
+    def _apply(self):
+        if self._sorted is None:
+            if self.sort_key == "path":
+                key = self.paths.__getitem__
+            elif self.sort_key == "kind":
+                key = self.kinds.__getitem__
+            elif self.sort_key == "used" and self.used is not None:
+                key = self.used.__getitem__
+            else:
+                key = self.sizes.__getitem__
+            self._sorted = array("l", sorted(range(len(self.paths)), key=key, reverse=not self.ascending))
+        if not self.needle:
+            self.order = self._sorted
+            return
+        if self._folded is None:
+            self._folded = [p.lower() for p in self.paths]
+        folded = self._folded
+        needle = self.needle
+        self.order = array("l", [i for i in self._sorted if needle in folded[i]])
+
+
+class ResultsTable:
+    """
+    Scrollable table over a ResultsModel that only draws the visible rows.
+
+    One background rectangle and one text item per column are created per visible
+    line and re-labelled on every scroll, so the cost of a redraw depends on the
+    window height, not on the number of rows. Click a header to sort by that column
+    (again to reverse), a row to select it, and double-click to activate it.
+    """
+
+    ROW_HEIGHT = 20
+
+    def __init__(self, master, model=None, width=880, height=300, palette=None, font="TkFixedFont",
+                 on_activate=None):
+        """
+        Args:
+            master: Parent widget.
+            model (ResultsModel|None): Rows to show (None => a new empty model).
+            width (int): Initial width in pixels.
+            height (int): Initial height in pixels.
+            palette (dict|None): Colours, see LIGHT_PALETTE (None => LIGHT_PALETTE).
+            font: Tk font for headers and rows (a fixed-width font keeps sizes aligned).
+            on_activate (callable|None): Called as on_activate(path, kind) on double-click or Return.
+        """
+        self.model = model if model is not None else ResultsModel()
+        self.palette = dict(LIGHT_PALETTE, **(palette or {}))
+        self.font = font
+        self.on_activate = on_activate
+        self.top = 0
+        self.selected = None
+        self._slots = []
+        self._visible = 0
+        self._columns = []
+
+        pal = self.palette
+        self.frame = tk.Frame(master, bg=pal["bg"], highlightthickness=0)
+        self.header = tk.Canvas(self.frame, height=self.ROW_HEIGHT, width=width, bg=pal["header_bg"],
+                                highlightthickness=0)
+        self.canvas = tk.Canvas(self.frame, width=width, height=height - self.ROW_HEIGHT, bg=pal["bg"],
+                                highlightthickness=0, takefocus=1)
+        self.scrollbar = tk.Scrollbar(self.frame, orient="vertical", command=self._on_scrollbar)
+        self.header.grid(row=0, column=0, sticky="ew")
+        self.canvas.grid(row=1, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, rowspan=2, sticky="ns")
+        self.frame.columnconfigure(0, weight=1)
+        self.frame.rowconfigure(1, weight=1)
+
+        self._char_width = max(1, tkinter.font.Font(root=self.frame, font=font).measure("0"))
+
+        self.canvas.bind("<Configure>", self._on_resize)
+        self.header.bind("<Button-1>", self._on_header_click)
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Double-Button-1>", self._on_double_click)
+        self.canvas.bind("<Return>", lambda e: self._activate())
+        for widget in (self.canvas, self.header):
+            widget.bind("<MouseWheel>", self._on_wheel)
+            widget.bind("<Button-4>", lambda e: self.scroll(-3))
+            widget.bind("<Button-5>", lambda e: self.scroll(3))
+        for key, step in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "page_up"), ("<Next>", "page_down"),
+                          ("<Home>", "home"), ("<End>", "end")):
+            self.canvas.bind(key, lambda e, step=step: self._move_selection(step))
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    # --- data -----------------------------------------------------------------------------
+
+    def set_rows(self, dirs, files=(), dir_usage=None):
+        """Replace the rows (see ResultsModel.set_rows) and redraw from the top."""
+        self.model.set_rows(dirs, files, dir_usage)
+        self.selected = None
+        self.top = 0
+        self._layout_columns()
+        self.redraw()
+
+    def set_filter(self, text):
+        """Filter rows by path substring and redraw; returns the number of rows shown."""
+        self.model.set_filter(text)
+        self.top = 0
+        self.redraw()
+        return len(self.model)
+
+    def sort(self, key, ascending=None):
+        self.model.sort(key, ascending)
+        self._draw_header()
+        self._scroll_to_selection()
+        self.redraw()
+
+    # --- drawing --------------------------------------------------------------------------
+
+    def _layout_columns(self):
+        """Fixed-width kind and size columns; the path takes the rest of the width."""
+        cw = self._char_width
+        width = max(self.canvas.winfo_width(), 200)
+        columns = [("kind", "Kind", 8 * cw, "w"), ("size", "Size", 12 * cw, "e")]
+        if self.model.used is not None:
+            columns.append(("used", "On disk", 12 * cw, "e"))
+        x = 0
+        self._columns = []
+        for key, title, col_width, anchor in columns:
+            self._columns.append((key, title, x, col_width, anchor))
+            x += col_width + 2 * cw
+        self._columns.append(("path", "Path", x, max(cw, width - x - cw), "w"))
+        self._draw_header()
+        # Column count changed: rebuild the row items
+        for items in self._slots:
+            for item in items:
+                self.canvas.delete(item)
+        self._slots = []
+        self._visible = 0
+
+    def _draw_header(self):
+        pal = self.palette
+        model = self.model
+        self.header.delete("all")
+        for key, title, x, col_width, anchor in self._columns:
+            if key == model.sort_key:
+                title += " ▲" if model.ascending else " ▼"
+            tx = x + 4 if anchor == "w" else x + col_width
+            self.header.create_text(tx, self.ROW_HEIGHT // 2, text=title, anchor=anchor, font=self.font,
+                                    fill=pal["header_fg"], tags=("col", key))
+
+    def _ensure_slots(self, count):
+        pal = self.palette
+        h = self.ROW_HEIGHT
+        while len(self._slots) < count:
+            y = len(self._slots) * h
+            items = [self.canvas.create_rectangle(0, y, 10 ** 5, y + h, width=0, fill=pal["bg"])]
+            for key, title, x, col_width, anchor in self._columns:
+                tx = x + 4 if anchor == "w" else x + col_width
+                items.append(self.canvas.create_text(tx, y + h // 2, anchor=anchor, font=self.font, fill=pal["fg"]))
+            self._slots.append(items)
+
+    def redraw(self):
+        """Re-label the pooled row items for the rows currently in view."""
+        if not self._columns:
+            self._layout_columns()
+        model = self.model
+        pal = self.palette
+        canvas = self.canvas
+        full = max(1, canvas.winfo_height() // self.ROW_HEIGHT)
+        # One more line than fits, for the partly visible row at the bottom
+        visible = full + 1
+        self._visible = visible
+        self.top = max(0, min(self.top, len(model) - full))
+        self._ensure_slots(visible)
+        path_chars = max(4, self._columns[-1][3] // self._char_width)
+        for slot, items in enumerate(self._slots):
+            pos = self.top + slot
+            if slot >= visible or pos >= len(model):
+                for item in items:
+                    canvas.itemconfigure(item, state="hidden")
+                continue
+            row_id, kind, path, size, used = model.row(pos)
+            if row_id == self.selected:
+                bg, fg = pal["select_bg"], pal["select_fg"]
+            else:
+                bg, fg = (pal["stripe"] if pos % 2 else pal["bg"]), pal["fg"]
+            canvas.itemconfigure(items[0], state="normal", fill=bg)
+            for item, (key, _, _, _, _) in zip(items[1:], self._columns):
+                if key == "kind":
+                    text = _KIND_NAMES[kind]
+                elif key == "size":
+                    text = format_size(size)
+                elif key == "used":
+                    text = format_size(used) if used >= 0 else ""
+                elif len(path) > path_chars:
+                    # Keep the end of long paths: the file or folder name matters most
+                    text = "…" + path[len(path) - path_chars + 1:]
+                else:
+                    text = path
+                canvas.itemconfigure(item, state="normal", text=text, fill=fg)
+        total = len(model)
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + full) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    # --- events ---------------------------------------------------------------------------
+
+    def scroll(self, rows):
+        self.top += rows
+        self.redraw()
+
+    def _on_scrollbar(self, *args):
+        page = max(1, self._visible - 1)
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.model))
+        elif args[0] == "scroll":
+            self.top += int(args[1]) * (page if args[2] == "pages" else 1)
+        self.redraw()
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        step = event.delta // 120 if abs(event.delta) >= 120 else (1 if event.delta > 0 else -1)
+        self.scroll(-3 * step)
+
+    def _on_resize(self, event):
+        if self._columns and self._columns[-1][2] + self._columns[-1][3] + self._char_width != event.width:
+            self._layout_columns()
+        self.redraw()
+
+    def _on_header_click(self, event):
+        for key, _, x, col_width, _ in self._columns:
+            if x <= event.x < x + col_width + 2 * self._char_width:
+                self.sort(key)
+                return
+
+    def _row_at(self, y):
+        pos = self.top + y // self.ROW_HEIGHT
+        return pos if pos < len(self.model) else None
+
+    def _on_click(self, event):
+        self.canvas.focus_set()
+        pos = self._row_at(event.y)
+        if pos is not None:
+            self.selected = self.model.order[pos]
+            self.redraw()
+
+    def _on_double_click(self, event):
+        self._on_click(event)
+        self._activate()
+
+    def _activate(self):
+        if self.on_activate is None or self.selected is None:
+            return
+        pos = self.model.position(self.selected)
+        if pos is not None:
+            _, kind, path, _, _ = self.model.row(pos)
+            self.on_activate(path, kind)
+
+    def _move_selection(self, step):
+        total = len(self.model)
+        if not total:
+            return
+        pos = self.model.position(self.selected) if self.selected is not None else None
+        page = max(1, self._visible - 1)
+        if step == "home":
+            pos = 0
+        elif step == "end":
+            pos = total - 1
+        elif pos is None:
+            pos = self.top
+        else:
+            pos += {"page_up": -page, "page_down": page}.get(step, step)
+        pos = max(0, min(total - 1, pos))
+        self.selected = self.model.order[pos]
+        if pos < self.top:
+            self.top = pos
+        elif pos >= self.top + page:
+            self.top = pos - page + 1
+        self.redraw()
+
+    def _scroll_to_selection(self):
+        """After a re-sort, keep the selected row in view."""
+        if self.selected is None:
+            self.top = 0
+            return
+        pos = self.model.position(self.selected)
+        self.top = 0 if pos is None else max(0, pos - self._visible // 2)
@@ -0,0 +1,152 @@
+"""
+Compact in-memory directory size tree.
+Every directory seen by a scan is one node; parents, own/total sizes and names
+live in flat tables (array('q') and a list of str) instead of per-node objects,
+so drilling into any level needs no rescan.
+"""
+
+import os
+from array import array
+
+
+class SizeTree:
+    """Array-backed directory tree; node 0 is the scanned root."""
+
+    def __init__(self, root_dir, parent, own, names, own_used=None):
+        """
+        Build the tree from flat tables (node ids must be topologically ordered:
+        every parent id is smaller than its children's ids).
+
+        Args:
+            root_dir (str): Path of node 0.
+            parent (array): parent[i] is the node id of i's parent (-1 for the root).
+            own (array): own[i] is the size in bytes of the files directly in node i.
+            names (list): names[i] is the directory name of node i (the full path for the root).
+            own_used (array|None): Allocated bytes of the files directly in node i (disk-usage scans).
+        """
+        self.root_dir = root_dir
+        self.parent = parent
+        self.own = own
+        self.names = names
+        self.own_used = own_used
+
+        # Roll file sizes up: children always come after their parent
+        self.total = self._roll_up(own)
+        self.used = self._roll_up(own_used) if own_used is not None else None
+
+        # Children in CSR form: child_ids[offsets[i]:offsets[i + 1]] are i's children
+        offsets = array("q", bytes(8 * (len(parent) + 1)))
+        for p in parent:
+            if p >= 0:
+                offsets[p + 1] += 1
+        for i in range(len(parent)):
+            offsets[i + 1] += offsets[i]
+        fill = array("q", offsets)
+        child_ids = array("q", bytes(8 * max(0, offsets[-1])))
+        for i, p in enumerate(parent):
+            if p >= 0:
+                child_ids[fill[p]] = i
+                fill[p] += 1
+        self.offsets = offsets
+        self.child_ids = child_ids
+
+    def _roll_up(self, own):
+        total = array("q", own)
+        parent = self.parent
+        for i in range(len(parent) - 1, 0, -1):
+            p = parent[i]
+            if p >= 0:
+                total[p] += total[i]
+        return total
+
+    @classmethod
+    def from_rows(cls, root_dir, root_own, rows, root_used=None):
+        """
+        Build a tree from per-walker row tables.
+
+        Args:
+            root_dir (str): Path of the root node (id 0).
+            root_own (int): Bytes of the files directly in root_dir.
+            rows (iterable): (node_ids, parent_ids, names, own_sizes, own_used) tables, one per
+                walker. Ids only need to be unique and ordered parent-before-child; they are
+                renumbered densely here.
+            root_used (int|None): Allocated bytes directly in root_dir; None unless the scan
+                measured disk usage.
+        """
+        ids = array("q", [0])
+        parents = array("q", [-1])
+        owns = array("q", [root_own])
+        used = array("q", [root_used or 0])
+        names = [root_dir]
+        for node_ids, parent_ids, row_names, own, own_used in rows:
+            ids.extend(node_ids)
+            parents.extend(parent_ids)
+            owns.extend(own)
+            used.extend(own_used)
+            names.extend(row_names)
+
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        remap = {ids[old]: new for new, old in enumerate(order)}
+        parent = array("q", (remap.get(parents[old], -1) for old in order))
+        own_used = array("q", (used[old] for old in order)) if root_used is not None else None
+        return cls(root_dir, parent, array("q", (owns[old] for old in order)), [names[old] for old in order],
+                   own_used)
+
+    @classmethod
+    def from_tables(cls, root_dir, parent, own, names, total, offsets, child_ids, own_used=None, used=None):
+        """
+        Wrap tables that were already rolled up and indexed (e.g. columns of a loaded
+        snapshot) without copying or recomputing them. Any sequences that support
+        indexing and slicing work (array('q'), memoryview cast to 'q').
+        """
+        tree = cls.__new__(cls)
+        tree.root_dir = root_dir
+        tree.parent = parent
+        tree.own = own
+        tree.names = names
+        tree.own_used = own_used
+        tree.total = total
+        tree.used = used
+        tree.offsets = offsets
+        tree.child_ids = child_ids
+        return tree
+
+    def __len__(self):
+        return len(self.parent)
+
+    def children(self, node):
+        """Return the node ids of node's immediate subdirectories."""
+        return self.child_ids[self.offsets[node]:self.offsets[node + 1]].tolist()
+
+    def path(self, node):
+        """Return the full path of node."""
+        parts = []
+        while node > 0:
+            parts.append(self.names[node])
+            node = self.parent[node]
+        parts.append(self.root_dir)
+        return os.path.join(*reversed(parts))
+
+    def find(self, path):
+        """Return the node id for path (absolute or relative to the root), or None if it is not in the tree."""
+        rel = os.path.relpath(os.path.join(self.root_dir, path), self.root_dir)
+        if rel == os.curdir:
+            return 0
+        if rel.startswith(os.pardir):
+            return None
+        node = 0
+        for part in rel.split(os.sep):
+            for child in self.children(node):
+                if self.names[child] == part:
+                    node = child
+                    break
+            else:
+                return None
+        return node
+
+    def largest_children(self, node, num=None):
+        """Return (directory_path, size_in_bytes) for node's largest immediate subdirectories."""
+        kids = sorted(self.children(node), key=self.total.__getitem__, reverse=True)
+        if num is not None:
+            kids = kids[:num]
+        return [(self.path(c), self.total[c]) for c in kids]
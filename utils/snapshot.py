@@ -0,0 +1,216 @@
+"""
+Scan snapshots in a packed columnar file.
+A snapshot stores a scan's size tree (parent, own and total size columns, the
+child index and directory names) plus its largest-files list as little-endian
+int64 arrays and name blobs. Loading maps the file with mmap, so the columns
+are used in place instead of being parsed or copied.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+from utils.sizetree import SizeTree
+
+MAGIC = b"SZSNAP\0\0"
+VERSION = 1
+
+# magic, version, flags, created, nodes, name bytes, files, file name bytes, root bytes, reserved
+_HEADER = struct.Struct("<8sIId6q")
+_HAS_USAGE = 1
+
+# Columns are written in this order; usage columns only when _HAS_USAGE is set
+_NODE_COLUMNS = ("parent", "own", "total", "offsets", "child_ids", "own_used", "used")
+
+
+def _pad(n):
+    return -n % 8
+
+
+def _pack_names(names):
+    """Return (offsets array, blob) for a sequence of str names."""
+    offsets = array("q", [0])
+    parts = []
+    pos = 0
+    for name in names:
+        raw = os.fsencode(name)
+        parts.append(raw)
+        pos += len(raw)
+        offsets.append(pos)
+    return offsets, b"".join(parts)
+
+
+def _little_endian(column):
+    column = array("q", column)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column
+
+
+class _PackedNames:
+    """Read-only sequence of str over a name blob and its offsets column (decoded on access)."""
+
+    __slots__ = ("blob", "offsets")
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return os.fsdecode(bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class Snapshot:
+    """A loaded snapshot: ``tree`` (SizeTree), ``files`` [(path, size)], ``root_dir`` and ``created`` (epoch seconds)."""
+
+    def __init__(self, root_dir, created, tree, files):
+        self.root_dir = root_dir
+        self.created = created
+        self.tree = tree
+        self.files = files
+
+    @property
+    def total_size(self):
+        return self.tree.total[0]
+
+
+def save_snapshot(path, result, created=None):
+    """
+    Write a ScanResult's size tree and largest files to path.
+
+    Args:
+        path (str): Destination file (overwritten).
+        result (ScanResult): A finished scan; its ``tree`` must be set.
+        created (float|None): Timestamp to record (None => now).
+    """
+    tree = result.tree
+    if tree is None:
+        raise ValueError("the scan result has no size tree to save")
+    has_usage = tree.used is not None
+    name_offsets, name_blob = _pack_names(tree.names[i] for i in range(len(tree)))
+    file_sizes = array("q", (size for _, size in result.files))
+    file_offsets, file_blob = _pack_names(p for p, _ in result.files)
+    root = os.fsencode(tree.root_dir)
+
+    header = _HEADER.pack(MAGIC, VERSION, _HAS_USAGE if has_usage else 0,
+                          time.time() if created is None else created,
+                          len(tree), len(name_blob), len(file_sizes), len(file_blob), len(root), 0)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(header)
+        fh.write(root + b"\0" * _pad(len(root)))
+        for column in _NODE_COLUMNS:
+            if column in ("own_used", "used") and not has_usage:
+                continue
+            fh.write(_little_endian(getattr(tree, column)).tobytes())
+        fh.write(_little_endian(name_offsets).tobytes())
+        fh.write(_little_endian(file_sizes).tobytes())
+        fh.write(_little_endian(file_offsets).tobytes())
+        fh.write(name_blob)
+        fh.write(file_blob)
+    # Replace atomically so a crash never leaves a half-written snapshot behind
+    os.replace(tmp, path)
+
+
+def load_snapshot(path):
+    """
+    Map a snapshot written by :func:`save_snapshot`.
+
+    On little-endian machines the integer columns are memoryviews into the mapping
+    (no copy); the mapping stays open for as long as the returned Snapshot is used.
+
+    Returns:
+        Snapshot: The saved tree and file list.
+    """
+    with open(path, "rb") as fh:
+        try:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ValueError(f"{path} is not a snapshot file") from None
+    view = memoryview(mm)
+    if len(view) < _HEADER.size or bytes(view[:8]) != MAGIC:
+        raise ValueError(f"{path} is not a snapshot file")
+    _, version, flags, created, num_nodes, names_len, num_files, file_names_len, root_len, _ = \
+        _HEADER.unpack_from(view)
+    if version != VERSION:
+        raise ValueError(f"{path} has unsupported snapshot version {version}")
+
+    pos = _HEADER.size
+    root_dir = os.fsdecode(bytes(view[pos:pos + root_len]))
+    pos += root_len + _pad(root_len)
+
+    def column(count):
+        nonlocal pos
+        col = view[pos:pos + 8 * count].cast("q")
+        pos += 8 * count
+        if sys.byteorder != "little":
+            col = array("q", col)
+            col.byteswap()
+        return col
+
+    parent = column(num_nodes)
+    own = column(num_nodes)
+    total = column(num_nodes)
+    offsets = column(num_nodes + 1)
+    child_ids = column(offsets[-1] if num_nodes else 0)
+    own_used = used = None
+    if flags & _HAS_USAGE:
+        own_used = column(num_nodes)
+        used = column(num_nodes)
+    name_offsets = column(num_nodes + 1)
+    file_sizes = column(num_files)
+    file_offsets = column(num_files + 1)
+    names = _PackedNames(view[pos:pos + names_len], name_offsets)
+    pos += names_len
+    file_names = _PackedNames(view[pos:pos + file_names_len], file_offsets)
+
+    tree = SizeTree.from_tables(root_dir, parent, own, names, total, offsets, child_ids, own_used, used)
+    files = list(zip(file_names, file_sizes))
+    return Snapshot(root_dir, created, tree, files)
+
+
+def diff_snapshots(old, new, num=None):
+    """
+    Compare two snapshots directory by directory (matched by path relative to each root).
+
+    Args:
+        old (Snapshot): The earlier snapshot.
+        new (Snapshot): The later snapshot.
+        num (int|None): Only return the num fastest-growing directories (None => all).
+
+    Returns:
+        list: (directory_path, old_size, new_size) for directories in the new snapshot
+        (old_size is 0 for directories that did not exist), largest growth first.
+    """
+    old_tree = old.tree
+    new_tree = new.tree
+    rows = []
+    pairs = [(0, 0)]
+    while pairs:
+        node, old_node = pairs.pop()
+        old_size = old_tree.total[old_node] if old_node >= 0 else 0
+        rows.append((node, old_size, new_tree.total[node]))
+        kids = new_tree.children(node)
+        if not kids:
+            continue
+        old_kids = {}
+        if old_node >= 0:
+            old_kids = {old_tree.names[k]: k for k in old_tree.children(old_node)}
+        for kid in kids:
+            pairs.append((kid, old_kids.get(new_tree.names[kid], -1)))
+    rows.sort(key=lambda r: r[2] - r[1], reverse=True)
+    if num is not None:
+        rows = rows[:num]
+    return [(new_tree.path(node), old_size, new_size) for node, old_size, new_size in rows]
@@ -0,0 +1,142 @@
+"""
+I/O pacing for the threaded walk.
+A ScanThrottle caps the filesystem operations per second with a token bucket
+and/or lets a controller grow and shrink the number of active walker threads
+from the stat latency and throughput it measures while scanning.
+"""
+
+import threading
+import time
+
+# Thread ceiling for adaptive scans when max_workers is not given
+ADAPTIVE_MAX_WORKERS = 128
+
+# Throughput changes smaller than this fraction count as noise
+_TOLERANCE = 0.05
+
+# Operations a sample needs before the controller acts on it
+_MIN_SAMPLE_OPS = 64
+
+
+class ScanThrottle:
+    """Concurrency and I/O-rate options for the threaded scan (pass as ``throttle=``)."""
+
+    def __init__(self, adaptive=False, max_iops=None, target_latency=None, min_workers=1, interval=0.5):
+        """
+        Args:
+            adaptive (bool): Adjust the number of active worker threads while scanning,
+                between min_workers and the scan's max_workers (None => ADAPTIVE_MAX_WORKERS).
+                Threads are added while throughput keeps improving and removed when it drops.
+            max_iops (float|None): Ceiling on filesystem operations (directory listings plus
+                stat calls) per second, shared by all workers (None => unlimited).
+            target_latency (float|None): Seconds per operation the adaptive controller backs off
+                above, e.g. 0.002 to stay gentle on a shared filer (None => throughput only).
+            min_workers (int): Fewest active threads in adaptive mode.
+            interval (float): Seconds between controller adjustments.
+        """
+        self.adaptive = adaptive
+        self.max_iops = max_iops
+        self.target_latency = target_latency
+        self.min_workers = max(1, min_workers)
+        self.interval = interval
+        # Filled in by the last scan that used this throttle: (elapsed_s, workers, ops_per_s, latency_s)
+        self.history = []
+
+
+class IopsLimiter:
+    """
+    Token bucket shared by all workers of one scan.
+
+    Workers :meth:`wait` before a directory and :meth:`spend` the operations it took
+    afterwards, so the bucket is touched twice per directory rather than once per file.
+    The balance may go negative after a large directory; later directories then wait
+    until the debt has been paid off at the configured rate.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        # A tenth of a second's worth of operations can run back to back
+        self.burst = float(burst) if burst is not None else max(1.0, self.rate / 10)
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def spend(self, ops):
+        with self._lock:
+            self._refill()
+            self._tokens -= ops
+
+    def wait(self, cancel_event=None):
+        """Blocks until the bucket is out of debt (or cancel_event is set)."""
+        while True:
+            with self._lock:
+                self._refill()
+                deficit = -self._tokens
+            if deficit <= 0 or (cancel_event is not None and cancel_event.is_set()):
+                return
+            time.sleep(min(deficit / self.rate, 0.05))
+
+
+class _Controller:
+    """
+    Hill-climbing worker-count controller for one adaptive walk.
+
+    Every interval it compares operations per second with the previous sample: a clear
+    gain keeps moving the limit in the same direction, a clear loss reverses it and a flat
+    result steps down, since threads that add nothing only add load. Per-operation latency
+    above the target halves the distance to min_workers regardless of throughput.
+    """
+
+    def __init__(self, throttle, initial, max_workers):
+        self.throttle = throttle
+        self.min_workers = min(throttle.min_workers, max_workers)
+        self.max_workers = max_workers
+        self.limit = max(self.min_workers, min(initial, max_workers))
+        self.direction = 1
+        self.last_rate = None
+        self.started = self._stamp = time.monotonic()
+        self._ops = 0
+        self._io_s = 0.0
+        throttle.history = []
+
+    def update(self, ops, io_s):
+        """
+        Takes running totals (operations, seconds spent in them, summed over workers);
+        returns the new number of active workers.
+        """
+        now = time.monotonic()
+        d_ops = ops - self._ops
+        if d_ops < _MIN_SAMPLE_OPS:
+            # Too little happened (e.g. the walk's tail) to judge; keep accumulating
+            return self.limit
+        rate = d_ops / (now - self._stamp)
+        latency = (io_s - self._io_s) / d_ops
+        self._stamp, self._ops, self._io_s = now, ops, io_s
+
+        target = self.throttle.target_latency
+        if target is not None and latency > target:
+            self.limit = max(self.min_workers, self.limit - max(1, (self.limit - self.min_workers + 1) // 2))
+            self.direction = 1
+            self.last_rate = None
+        else:
+            if self.last_rate is not None:
+                if rate < self.last_rate * (1 - _TOLERANCE):
+                    self.direction = -self.direction
+                elif rate <= self.last_rate * (1 + _TOLERANCE):
+                    self.direction = -1
+            if self.direction > 0 and target is not None and latency > target * 0.8:
+                # Close to the target: do not add load
+                self.direction = 0
+            step = max(1, self.limit // 4) * self.direction
+            self.limit = max(self.min_workers, min(self.max_workers, self.limit + step))
+            self.last_rate = rate
+            if self.limit == self.min_workers or self.direction == 0:
+                # Probe upwards again next time
+                self.direction = 1
+        self.throttle.history.append((now - self.started, self.limit, rate, latency))
+        return self.limit
@@ -0,0 +1,78 @@
+"""
+Batched UI update channel for CustomTkinter GUI.
+Worker threads queue text and callbacks; the Tk main loop drains the queue on a
+fixed tick and writes all pending text with a single widget insert.
+"""
+
+import queue
+import sys
+
+
+class UpdateChannel:
+    """Thread-safe, rate-limited pipe from worker threads to the Tk main loop."""
+
+    def __init__(self, root_widget, write_text, interval=50, max_batch=5000):
+        """
+        Initialize the channel.
+
+        Args:
+            root_widget: Root CTk window (for root.after scheduling)
+            write_text: Main-thread function that appends a string to the output widget
+            interval (int): Drain tick in milliseconds; caps redraws at 1000/interval per second (default 50ms)
+            max_batch (int): Maximum queued messages handled per tick, so one tick never stalls the UI
+        """
+        self.root = root_widget
+        self.write_text = write_text
+        self.interval = interval
+        self.max_batch = max_batch
+        self._queue = queue.SimpleQueue()
+        self.is_active = False
+
+    def put_text(self, text):
+        """Queue text for the output widget (safe from any thread)."""
+        self._queue.put(text)
+
+    def call(self, func, *args):
+        """Queue func(*args) to run on the main thread, after any text queued before it."""
+        self._queue.put((func, args))
+
+    def start(self):
+        """Start draining the queue on the main loop."""
+        if not self.is_active:
+            self.is_active = True
+            self.root.after(self.interval, self._drain)
+
+    def stop(self):
+        """Stop draining (queued items stay queued until start is called again)."""
+        self.is_active = False
+
+    def _drain(self):
+        """Internal method: coalesce queued text into one insert and run queued calls in order."""
+        if not self.is_active:
+            return
+        try:
+            chunks = []
+            for _ in range(self.max_batch):
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, str):
+                    chunks.append(item)
+                    continue
+                if chunks:
+                    self._run(self.write_text, ("".join(chunks),))
+                    chunks = []
+                self._run(*item)
+            if chunks:
+                self._run(self.write_text, ("".join(chunks),))
+        finally:
+            # Keep draining whatever happens, or the UI would never be re-enabled
+            self.root.after(self.interval, self._drain)
+
+    def _run(self, func, args):
+        """Internal method: run one queued item; a failure is reported like any Tk callback error and skipped."""
+        try:
+            func(*args)
+        except Exception:
+            self.root.report_callback_exception(*sys.exc_info())
@@ -0,0 +1,429 @@
+"""
+Live watch mode.
+After one full scan, folder totals are kept current from filesystem change
+notifications instead of rescans: Linux inotify (through ctypes) reports which
+directories changed, and only those are listed again. Where inotify is not
+available, directory mtimes are polled instead.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+
+from utils.finder import ScanResult, scan
+
+# inotify event bits (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+
+# Any change to a directory's entries or to the size of a file directly in it
+_WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+               | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+
+# struct inotify_event header: wd, mask, cookie, len (the name follows)
+_EVENT = struct.Struct("iIII")
+
+# Directory mtimes come from a coarse kernel clock (and FAT stores them in 2 s steps), so
+# they can read earlier than a time.time_ns() taken before the change
+_MTIME_SLACK_NS = 2_000_000_000
+
+
+class _Inotify:
+    """Minimal inotify binding: one non-blocking descriptor, add/remove watches, read batches of events."""
+
+    def __init__(self):
+        path = ctypes.util.find_library("c")
+        libc = ctypes.CDLL(path or "libc.so.6", use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._rm = libc.inotify_rm_watch
+        self._rm.argtypes = (ctypes.c_int, ctypes.c_int)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        self.fd = fd
+
+    def add_watch(self, path, mask=_WATCH_MASK):
+        wd = self._add(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), path)
+        return wd
+
+    def rm_watch(self, wd):
+        # Fails harmlessly when the kernel already dropped the watch
+        self._rm(self.fd, wd)
+
+    def read(self, timeout):
+        """Returns [(wd, mask, name), ...] for the events that arrive within timeout seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                return events
+            pos = 0
+            while pos < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, pos)
+                pos += _EVENT.size
+                name = data[pos:pos + length].rstrip(b"\0")
+                pos += length
+                events.append((wd, mask, os.fsdecode(name)))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class DirectoryWatcher:
+    """
+    In-memory folder totals for one root, kept current by re-listing changed directories.
+
+    Only the bytes of the files directly in each directory and its subdirectory paths are
+    kept, plus one running total per top-level subdirectory, so applying a change costs
+    one listing of the changed directory (a new subdirectory is walked once; a removed or
+    renamed one is subtracted without touching the disk). Moves are handled as a removal
+    plus an addition.
+    """
+
+    def __init__(self, root_dir, filters=None, use_inotify=True):
+        """
+        Args:
+            root_dir (str): Directory to watch.
+            filters (ScanFilter|None): Prunes directories and files, as in :func:`scan`.
+            use_inotify (bool): Use inotify when the platform has it (False => poll mtimes).
+        """
+        self.root_dir = os.path.abspath(root_dir)
+        self.filters = filters
+        self.pruner = filters.bind(self.root_dir) if filters is not None else None
+        self._root_len = len(self.root_dir.rstrip(os.sep)) + 1
+        self.own = {}
+        self.children = {}
+        self.slot_totals = {}
+        self.mtimes = {}
+        self.inotify = None
+        self._wd_path = {}
+        self._path_wd = {}
+        if use_inotify:
+            try:
+                self.inotify = _Inotify()
+            except (OSError, AttributeError):
+                # No inotify (not Linux, or no free instances): poll instead
+                self.inotify = None
+
+    @property
+    def mode(self):
+        return "inotify" if self.inotify is not None else "polling"
+
+    def _slot(self, path):
+        """The top-level subdirectory path is under (None for the root itself)."""
+        if path == self.root_dir:
+            return None
+        return path[:self._root_len] + path[self._root_len:].split(os.sep, 1)[0]
+
+    def _add_bytes(self, path, delta):
+        slot = self._slot(path)
+        self.slot_totals[slot] = self.slot_totals.get(slot, 0) + delta
+
+    def _list(self, path):
+        """Returns (bytes of the files directly in path, set of subdirectory paths), or None if unreadable."""
+        pruner = self.pruner
+        own = 0
+        subdirs = set()
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if pruner is None or not pruner.skip_dir(entry):
+                                subdirs.add(entry.path)
+                            continue
+                        if entry.is_symlink():
+                            continue
+                        size = entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+                    if pruner is None or not pruner.skip_file(entry, size):
+                        own += size
+        except OSError:
+            return None
+        return own, subdirs
+
+    def _watch(self, path):
+        """Starts watching path; returns False when it is gone. Falls back to polling at the watch limit."""
+        if self.inotify is not None:
+            try:
+                wd = self.inotify.add_watch(path)
+            except OSError as e:
+                if e.errno != errno.ENOSPC:
+                    return False
+                # Out of watches (fs.inotify.max_user_watches): switch to polling for everything
+                self._stop_inotify()
+            else:
+                self._wd_path[wd] = path
+                self._path_wd[path] = wd
+                return True
+        try:
+            self.mtimes[path] = os.stat(path, follow_symlinks=False).st_mtime_ns
+        except OSError:
+            return False
+        return True
+
+    def _stop_inotify(self):
+        self.inotify.close()
+        self.inotify = None
+        for path in self._path_wd:
+            try:
+                self.mtimes[path] = os.stat(path, follow_symlinks=False).st_mtime_ns
+            except OSError:
+                pass
+        self._wd_path.clear()
+        self._path_wd.clear()
+
+    def _unwatch(self, path):
+        wd = self._path_wd.pop(path, None)
+        # A directory renamed within the tree may already have been re-added under its new
+        # path, which reuses the inode's watch; that watch must stay
+        if wd is not None and self._wd_path.get(wd) == path:
+            del self._wd_path[wd]
+            self.inotify.rm_watch(wd)
+        self.mtimes.pop(path, None)
+
+    def _add_tree(self, top):
+        """Walks a new subtree into the totals (each directory is watched before it is listed)."""
+        stack = [top]
+        while stack:
+            path = stack.pop()
+            if path in self.own or not self._watch(path):
+                continue
+            listing = self._list(path)
+            if listing is None:
+                self._unwatch(path)
+                continue
+            own, subdirs = listing
+            self.own[path] = own
+            self.children[path] = subdirs
+            self._add_bytes(path, own)
+            stack.extend(subdirs)
+
+    def _remove_tree(self, top):
+        """Drops a vanished subtree from the totals."""
+        stack = [top]
+        while stack:
+            path = stack.pop()
+            own = self.own.pop(path, None)
+            if own is None:
+                continue
+            self._add_bytes(path, -own)
+            stack.extend(self.children.pop(path))
+            self._unwatch(path)
+        if self._slot(top) == top:
+            self.slot_totals.pop(top, None)
+
+    def refresh(self, path):
+        """Re-lists one known directory and applies the difference."""
+        if path not in self.own:
+            return
+        if self.inotify is None:
+            # Taken before listing, so a change during the listing shows up at the next poll
+            try:
+                self.mtimes[path] = os.stat(path, follow_symlinks=False).st_mtime_ns
+            except OSError:
+                pass
+        listing = self._list(path)
+        if listing is None:
+            # Gone; its parent's refresh removes it (or the root is gone and nothing is left)
+            if path == self.root_dir:
+                self._remove_tree(path)
+            return
+        own, subdirs = listing
+        self._add_bytes(path, own - self.own[path])
+        self.own[path] = own
+        old = self.children[path]
+        self.children[path] = subdirs
+        for gone in old - subdirs:
+            self._remove_tree(gone)
+        for new in subdirs - old:
+            self._add_tree(new)
+
+    def start(self, max_workers=None, cancel_event=None, tree=None, started_ns=None):
+        """
+        Initial full scan (the parallel :func:`scan`), then watches on every directory.
+
+        Directories whose entries changed while the scan ran (mtime after its start) are
+        listed again once watched; files that only grew during the scan are picked up at
+        their next change.
+
+        Args:
+            max_workers (int|None): Worker threads for the initial scan.
+            cancel_event (threading.Event|None): Stops the initial scan early.
+            tree (SizeTree|None): Size tree of a finished, complete scan of the same root with
+                the same filters, used instead of scanning again.
+            started_ns (int|None): time.time_ns() when that scan started (required with tree).
+        """
+        if tree is None:
+            started_ns = time.time_ns()
+            tree = scan(self.root_dir, num_dirs=0, num_files=0, max_workers=max_workers,
+                        cancel_event=cancel_event, filters=self.filters).tree
+        elif started_ns is None:
+            raise ValueError("started_ns is required when starting from an existing tree")
+        # Nodes are ordered parent-before-child, so each path is known before its children's
+        paths = {0: self.root_dir}
+        for node in range(len(tree)):
+            path = paths[node]
+            subdirs = set()
+            for child in tree.children(node):
+                paths[child] = child_path = os.path.join(path, tree.names[child])
+                subdirs.add(child_path)
+            self.own[path] = tree.own[node]
+            self.children[path] = subdirs
+            self._add_bytes(path, tree.own[node])
+        stale = []
+        for path in list(self.own):
+            if not self._watch(path):
+                stale.append(path)
+                continue
+            try:
+                if os.stat(path, follow_symlinks=False).st_mtime_ns >= started_ns - _MTIME_SLACK_NS:
+                    stale.append(path)
+            except OSError:
+                stale.append(path)
+        for path in stale:
+            self.refresh(path)
+
+    def result(self, num_dirs=10):
+        """Current totals as a ScanResult (largest top-level subdirectories; no file list or tree)."""
+        dirs = [(p, size) for p, size in self.slot_totals.items() if p is not None]
+        dirs.sort(key=lambda item: item[1], reverse=True)
+        return ScanResult(self.root_dir, dirs[:num_dirs], [], subdir_count=len(dirs),
+                          total_size=sum(self.slot_totals.values()))
+
+    def changed_dirs(self, timeout=0.0):
+        """
+        Returns the set of directories that changed (every known directory after an inotify
+        queue overflow). With inotify, waits up to timeout seconds for the first event;
+        polling compares directory mtimes right away.
+        """
+        if self.inotify is None:
+            changed = set()
+            for path, mtime in list(self.mtimes.items()):
+                try:
+                    if os.stat(path, follow_symlinks=False).st_mtime_ns != mtime:
+                        changed.add(path)
+                except OSError:
+                    changed.add(path)
+            return changed
+        changed = set()
+        for wd, mask, _ in self.inotify.read(timeout):
+            if mask & IN_Q_OVERFLOW:
+                return set(self.own)
+            path = self._wd_path.get(wd)
+            if path is None:
+                continue
+            if mask & IN_IGNORED:
+                self._wd_path.pop(wd, None)
+                if self._path_wd.get(path) == wd:
+                    del self._path_wd[path]
+            # Deleted or moved away: the parent's listing settles it
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                parent = os.path.dirname(path)
+                changed.add(parent if parent in self.own else path)
+            else:
+                changed.add(path)
+        return changed
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+
+def _stopped(cancel_event, timeout):
+    """Sleeps up to timeout seconds; True as soon as cancel_event is set."""
+    if cancel_event is None:
+        if timeout:
+            time.sleep(timeout)
+        return False
+    return cancel_event.wait(timeout) if timeout else cancel_event.is_set()
+
+
+def watch(root_dir, num_dirs=10, cancel_event=None, on_update=None, filters=None, debounce=0.5,
+          poll_interval=2.0, resync_interval=300.0, use_inotify=True, max_workers=None, tree=None,
+          started_ns=None):
+    """
+    Scans root_dir once (or starts from a finished scan's tree), then keeps its
+    largest-subdirectory ranking current until cancel_event is set.
+
+    Args:
+        root_dir (str): Directory to watch.
+        num_dirs (int): Number of largest subdirectories to report.
+        cancel_event (threading.Event|None): Stops watching when set (None => until interrupted).
+        on_update (callable|None): Called with a ScanResult after the initial scan and whenever
+            totals change (at most once per debounce interval).
+        filters (ScanFilter|None): Prunes directories and files.
+        debounce (float): Seconds to collect changes before applying them; bursts of writes to
+            one directory cost a single listing.
+        poll_interval (float): Seconds between mtime checks when polling (no inotify).
+        resync_interval (float|None): When polling, seconds between full re-listings, which
+            also catch files that grew in place (directory mtimes do not change for those).
+            inotify reports such writes directly (None => never).
+        use_inotify (bool): Use inotify when available.
+        max_workers (int|None): Worker threads for the initial scan.
+        tree (SizeTree|None): ScanResult.tree of a complete scan of root_dir with the same
+            filters; skips the initial scan.
+        started_ns (int|None): time.time_ns() taken just before that scan started (required
+            with tree; directories modified since then are listed again).
+
+    Returns:
+        ScanResult: The ranking when watching stopped.
+    """
+    watcher = DirectoryWatcher(root_dir, filters, use_inotify)
+    try:
+        watcher.start(max_workers, cancel_event, tree, started_ns)
+        if on_update is not None:
+            on_update(watcher.result(num_dirs))
+        last_sync = time.monotonic()
+        while not _stopped(cancel_event, 0):
+            if watcher.inotify is not None:
+                # Short waits keep cancellation responsive
+                changed = watcher.changed_dirs(0.25)
+                if changed and not _stopped(cancel_event, debounce):
+                    # Let a burst settle, then take everything that queued up meanwhile
+                    changed |= watcher.changed_dirs()
+            else:
+                if _stopped(cancel_event, poll_interval):
+                    break
+                changed = watcher.changed_dirs()
+                if resync_interval is not None and time.monotonic() - last_sync >= resync_interval:
+                    changed = set(watcher.own)
+                    last_sync = time.monotonic()
+            if not changed:
+                continue
+            before = watcher.result(num_dirs)
+            # Parents first: a removed subtree is dropped before its own entries are looked at
+            for path in sorted(changed, key=len):
+                watcher.refresh(path)
+            after = watcher.result(num_dirs)
+            if on_update is not None and (after.dirs != before.dirs or after.total_size != before.total_size):
+                on_update(after)
+        return watcher.result(num_dirs)
+    finally:
+        watcher.close()